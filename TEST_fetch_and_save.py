@@ -1,13 +1,27 @@
 import db
 import api_client
 import logging
+import secrets
+import sys
+
+SCRIPT_USERNAME = "fetch and save script" # Owner of the movies this script saves; the space keeps it out of reach of the signup form
+SCRIPT_STATUS = "Want to Watch"
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("Starting movie data fetching and saving process.")
 
     # Set up the database (creates file and table if needed)
     db.create_database()
 
+    # Movies belong to a user, so save them under a dedicated script user (created on first run)
+    user_id, _ = db.find_user_by_username(SCRIPT_USERNAME)
+    if not user_id:
+        user_id = db.add_user(SCRIPT_USERNAME, secrets.token_urlsafe(16)) # Never logged in to
+    if not user_id:
+        logging.error("Could not find or create the script user '%s'.", SCRIPT_USERNAME)
+        sys.exit(1)
+
     # List of movies to fetch and save
     movie_titles_to_fetch = [
         "Inception",
@@ -18,33 +32,52 @@ if __name__ == "__main__":
         "Movie That Does Not Exist 12345" # Example of a movie that won't be found
     ]
 
+    # Trim and drop duplicates/case variants so each title costs at most one OMDb call
+    seen = set()
+    titles = []
+    for t in movie_titles_to_fetch:
+        key = t.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            titles.append(t.strip())
+
     # Fetch data from API and save to database
-    logging.info(f"Attempting to fetch and save {len(movie_titles_to_fetch)} movies...")
-    for title in movie_titles_to_fetch:
-        movie_data = api_client.get_movie_details(title) # Fetch data from API
+    logging.info("Attempting to fetch and save %d movies...", len(titles))
+    # Fetch concurrently; the requests are I/O bound and share the api_client session
+    results = api_client.get_movie_details_batch(titles)
 
+    fetched = []
+    for title, movie_data in zip(titles, results):
         if movie_data:
-            # Data was fetched successfully, now add it to the database
-            # The add_movie function handles potential duplicates
-            db.add_movie(movie_data)
+            fetched.append(movie_data)
         else:
-            logging.warning(f"Skipping saving for '{title}' as details could not be fetched.")
+            logging.warning("Skipping saving for '%s' as details could not be fetched.", title)
+    # One transaction for the whole batch; movies the user already has are ignored
+    added = db.add_movies_bulk(user_id, fetched, SCRIPT_STATUS)
+    logging.info("Saved %d new movies for '%s'.", added, SCRIPT_USERNAME)
 
     logging.info("Finished attempting to fetch and save movies.")
 
     # Verify data by fetching all records and printing (optional)
     logging.info("\nFetching all movies from the database to verify:")
-    all_movies = db.get_all_movies()
-    if all_movies:
-        # Print header
-        print("-" * 80)
-        print(f"{'IMDb ID':<10} | {'Title':<30} | {'Year':<6} | {'Director':<20}")
-        print("-" * 80)
-        for movie in all_movies:
-             # movie is a tuple: (imdb_id, title, year, director, genre, poster_url, date_added)
-             print(f"{movie[0]:<10} | {movie[1]:<30} | {movie[2]:<6} | {movie[3]:<20}")
-        print("-" * 80)
-        logging.info(f"Displayed {len(all_movies)} records.")
+    # Stream rows straight from the cursor and write them in chunks instead of one print() per row
+    separator = "-" * 80
+    lines = []
+    count = 0
+    for movie in db.iter_all_movies():
+        if count == 0:
+            lines += [separator, f"{'IMDb ID':<10} | {'Title':<30} | {'Year':<6} | {'Director':<20}", separator]
+        # movie is a sqlite3.Row keyed by db.MOVIE_COLUMNS; every column but imdb_id may be NULL
+        imdb_id, title, year, director = (str(movie[col] or "") for col in ("imdb_id", "title", "year", "director"))
+        lines.append(f"{imdb_id:<10} | {title:<30} | {year:<6} | {director:<20}")
+        count += 1
+        if len(lines) >= 1024:
+            sys.stdout.write("\n".join(lines) + "\n")
+            lines = []
+    if count:
+        lines.append(separator)
+        sys.stdout.write("\n".join(lines) + "\n")
+        logging.info("Displayed %d records.", count)
     else:
         logging.info("No movies found in the database.")
 
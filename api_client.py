@@ -1,11 +1,15 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from diskcache import Cache
 from dotenv import load_dotenv
 import streamlit as st
 
-# Configure basic logging (can be shared or configured in main script)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,9 +18,66 @@ load_dotenv()
 OMDB_API_KEY = st.secrets["OMDB_KEY"]
 
 OMDB_BASE_URL = 'https://www.omdbapi.com/'
+OMDB_TIMEOUT = (3.05, 10) # (connect, read) seconds
+
+def _build_session():
+    """Creates a requests.Session with connection pooling and retries on 5xx responses."""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries))
+    return session
+
+# Shared session so repeated OMDb calls reuse the same keep-alive TCP/TLS connection
+_SESSION = _build_session()
+
+def get_session():
+    """Returns the shared OMDb session."""
+    return _SESSION
+
+# On-disk cache of OMDb responses, keyed on the normalized title. Lives next to this module unless
+# OMDB_CACHE_DIR is set, so it doesn't depend on the working directory.
+OMDB_CACHE_DIR = os.getenv("OMDB_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".omdb_cache"))
+OMDB_CACHE_TTL = 86400 * 30 # Found movies: 30 days
+OMDB_NOT_FOUND_TTL = 86400 # Not-found titles: 1 day, so typos don't stick forever
+_cache = None # Opened on first lookup, so importing this module doesn't create the directory
+_cache_lock = threading.Lock()
+
+def _get_cache():
+    """Returns the OMDb response cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = Cache(OMDB_CACHE_DIR)
+    return _cache
+
+def _cache_key(title):
+    return title.strip().lower()
+
+def _cache_get(key):
+    """Cached OMDb response for key, or None if absent or the cache can't be read (the caller then asks OMDb)."""
+    try:
+        return _get_cache().get(key)
+    except Exception as e:
+        logger.warning("EVENT: OMDbCacheError - Op: get, Key: %s, Error: %s", key, e, extra={"event": "OMDbCacheError"})
+        return None
+
+def _cache_set(key, value, expire):
+    """Stores an OMDb response; a cache write failure is logged and doesn't affect the fetched result."""
+    try:
+        _get_cache().set(key, value, expire=expire)
+    except Exception as e:
+        logger.warning("EVENT: OMDbCacheError - Op: set, Key: %s, Error: %s", key, e, extra={"event": "OMDbCacheError"})
 
 def get_movie_details(title):
     """Fetches movie details from OMDb API by title."""
+    title = title.strip()
+
+    key = _cache_key(title)
+    cached = _cache_get(key)
+    if cached is not None:
+        logger.info("EVENT: OMDbCacheHit - Query: %s", title, extra={"event": "OMDbCacheHit"})
+        return cached or None # An empty dict marks a cached 'not found'
 
     params = {
         't': title,     # Search by title
@@ -25,35 +86,44 @@ def get_movie_details(title):
         'r': 'json'      # Response format
     }
 
-    logging.info(f"Attempting to fetch movie details for: {title} from OMDb API")
     # Log an 'event' of an API call attempt
-    logging.info(f"EVENT: OMDbAPICall - Query: {title}")
+    logger.info("EVENT: OMDbAPICall - Query: %s", title, extra={"event": "OMDbAPICall"})
 
     try:
-        response = requests.get(OMDB_BASE_URL, params=params)
+        response = get_session().get(OMDB_BASE_URL, params=params, timeout=OMDB_TIMEOUT)
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
 
         data = response.json()
 
         # OMDb API returns 'Response': 'True' on success, 'False' on failure (e.g., movie not found)
         if data.get('Response') == 'True':
-            logging.info(f"Successfully fetched details for: {data.get('Title')}")
-            # Log an 'event' of a successful API fetch
-            logging.info(f"EVENT: OMDbAPISuccess - Title: {data.get('Title')}, IMDbID: {data.get('imdbID')}")
+            if logger.isEnabledFor(logging.INFO): # Skip the dict lookups when INFO is off
+                # Log an 'event' of a successful API fetch
+                logger.info("EVENT: OMDbAPISuccess - Title: %s, IMDbID: %s", data.get('Title'), data.get('imdbID'),
+                            extra={"event": "OMDbAPISuccess"})
+            _cache_set(key, data, OMDB_CACHE_TTL)
             return data # Return the dictionary containing movie data
         else:
-            logging.warning(f"OMDb API did not find movie '{title}' or returned error: {data.get('Error')}")
-            # Log an 'event' of an API fetch failure
-            logging.info(f"EVENT: OMDbAPIFailure - Query: {title}, Error: {data.get('Error', 'Unknown')}")
+            # Log an 'event' of an API fetch failure (movie not found or an error reported by OMDb)
+            logger.warning("EVENT: OMDbAPIFailure - Query: %s, Error: %s", title, data.get('Error', 'Unknown'),
+                           extra={"event": "OMDbAPIFailure"})
+            _cache_set(key, {}, OMDB_NOT_FOUND_TTL)
             return None # Movie not found or API error reported in the response
 
     except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching movie '{title}' from OMDb API: {e}")
         # Log an 'event' of a network/request error
-        logging.info(f"EVENT: OMDbAPIRequestError - Query: {title}, Error: {e}")
+        logger.error("EVENT: OMDbAPIRequestError - Query: %s, Error: %s", title, e, extra={"event": "OMDbAPIRequestError"})
         return None # Handle request errors (network issues, etc.)
     except Exception as e:
-         logging.error(f"Unexpected error processing OMDb API response for '{title}': {e}")
          # Log an 'event' of an unexpected error
-         logging.info(f"EVENT: OMDbAPIUnexpectedError - Query: {title}, Error: {e}")
-         return None
\ No newline at end of file
+         logger.error("EVENT: OMDbAPIUnexpectedError - Query: %s, Error: %s", title, e, extra={"event": "OMDbAPIUnexpectedError"})
+         return None
+
+def get_movie_details_batch(titles, max_workers=8):
+    """Fetches details for several titles concurrently. Returns results in the same order as titles."""
+    titles = list(titles)
+    if not titles:
+        return []
+    logger.info("EVENT: OMDbAPIBatchCall - Count: %d", len(titles), extra={"event": "OMDbAPIBatchCall"})
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(titles))) as executor:
+        return list(executor.map(get_movie_details, titles))
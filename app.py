@@ -4,28 +4,74 @@ import pandas as pd
 import db
 import api_client
 import logging
-from passlib.hash import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+logger = logging.getLogger(__name__)
 db.create_database()
 
 # --- Session State & Auth ---
-if 'user_id' not in st.session_state:
-    st.session_state.user_id = None
-if 'username' not in st.session_state:
-    st.session_state.username = None
-if 'auth_error' not in st.session_state:
-    st.session_state.auth_error = False 
+SESSION_DEFAULTS = {
+    "user_id": None,
+    "username": None,
+    "auth_error": False,
+    "movies_version": 0, # Bumped after every write so the cached movie frames refresh
+}
+for key, default in SESSION_DEFAULTS.items():
+    st.session_state.setdefault(key, default)
+
+MOVIE_DF_COLS = ["DB ID", "IMDb ID", "Title", "Year", "Director", "Genre", "Poster URL", "Status", "User Rating", "Date Added"]
+# Displayed text columns, Arrow-backed so st.data_editor skips a per-cell object conversion; Year stays text ("2010–2014")
+_TEXT_COLS = ["Title", "Year", "Director", "Genre", "Poster URL"]
+PAGE_SIZE = 50 # Movies shown per page in each list
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_movies_by_status(user_id, status, version, page=1):
+    """Returns one page of a user's movies with the given status as a DataFrame; cached until `version` changes."""
+    columns = db.get_movies_by_status_columnar(user_id, status, limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
+    # Build from whole columns rather than row tuples; an empty page still gets the right columns
+    data = dict(zip(MOVIE_DF_COLS, columns.values()))
+    data["Date Added"] = pd.to_datetime(data["Date Added"], unit="ms", utc=True) # Stored as epoch milliseconds
+    data["User Rating"] = pd.array(data["User Rating"], dtype="Int8") # 1-5 or missing
+    for col in _TEXT_COLS:
+        data[col] = pd.array(data[col], dtype="string[pyarrow]")
+    df = pd.DataFrame(data)
+    # OMDb uses "N/A" for missing posters; send nothing instead of a broken image URL
+    df["Poster URL"] = df["Poster URL"].where(df["Poster URL"] != "N/A")
+    return df
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_movie_count(user_id, version, status=None):
+    """Cached db.count_movies for the page pickers and the Danger Zone; refreshed along with the movie frames."""
+    return db.count_movies(user_id, status)
+
+def bump_movies_version():
+    """Invalidates the cached movie frames and counts after a DB write."""
+    # The cache is shared by every session, and another session of the same user may be at the same version
+    load_movies_by_status.clear()
+    load_movie_count.clear()
+    st.session_state.movies_version += 1
+
+def select_page(status, key):
+    """Shows a page picker when a list is longer than PAGE_SIZE and returns the selected 1-based page."""
+    total = load_movie_count(st.session_state.user_id, st.session_state.movies_version, status)
+    page_count = max(1, -(-total // PAGE_SIZE)) # Ceiling division
+    if page_count == 1:
+        return 1
+    return st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1, key=key)
+
+# app.py is re-executed on every rerun, so long-lived auth state is held with st.cache_resource
+@st.cache_resource
+def get_auth_pool():
+    """Shared pool for bcrypt so concurrent logins and sign-ups from different sessions overlap."""
+    return ThreadPoolExecutor(max_workers=4)
 
 def authenticate(username, password):
-    user_id, hashed_password = db.find_user_by_username(username)
-    if user_id and hashed_password:
-        try:
-            if bcrypt.verify(password, hashed_password):
-                return user_id, username
-            return None, None # Incorrect password
-        except ValueError: return None, None # Invalid hash
-    return None, None # User not found
+    # db.verify_user spends one bcrypt check per attempt (a dummy one for unknown names) and upgrades outdated hashes
+    user_id = get_auth_pool().submit(db.verify_user, username, password).result()
+    if user_id:
+        return user_id, username
+    return None, None # Unknown user, wrong password or invalid stored hash
 
 def create_account(username, password):
     if not username or not password or len(password) < 4 or " " in username:
@@ -34,7 +80,7 @@ def create_account(username, password):
         if len(password) < 4 and password: st.error("Password must be at least 4 characters long.")
         return False
     # db.add_user now returns user_id or None
-    user_id = db.add_user(username, password)
+    user_id = get_auth_pool().submit(db.add_user, username, password).result()
     if user_id:
         # st.success is handled by the calling code in this version
         return True 
@@ -42,50 +88,21 @@ def create_account(username, password):
         # st.error is handled by the calling code in this version
         return False
 
-
 def logout():
+    load_movies_by_status.clear() # Don't keep this user's movies in memory after they leave
+    load_movie_count.clear()
     st.session_state.user_id = None
     st.session_state.username = None
     st.session_state.auth_error = False
-    # Clear editor states
-    if "want_to_watch_editor" in st.session_state: del st.session_state.want_to_watch_editor
-    if "watched_movies_editor" in st.session_state: del st.session_state.watched_movies_editor
+    # Clear editor and paging states (editor keys carry a page suffix)
+    for key in list(st.session_state.keys()):
+        if key.startswith(("want_to_watch_", "watched_")):
+            del st.session_state[key]
     st.rerun()
 
-st.set_page_config(page_title="Movie Tracker", layout="wide")
-st.title("Movie Tracker")
-
-if st.session_state.user_id is None:
-    st.header("Login or Create Account")
-    col1, col2 = st.columns(2)
-    with col1:
-        with st.form("login_form"):
-            st.subheader("Login")
-            login_user = st.text_input("Username", key="login_u") # User's key
-            login_pass = st.text_input("Password", type="password", key="login_p") # User's key
-            if st.form_submit_button("Login"):
-                uid, uname = authenticate(login_user, login_pass)
-                if uid:
-                    st.session_state.user_id, st.session_state.username = uid, uname
-                    st.session_state.auth_error = False
-                    st.rerun()
-                else:
-                    st.session_state.auth_error = True
-        if st.session_state.auth_error: st.error("Login failed.")
-    with col2:
-        with st.form("create_account_form"):
-            st.subheader("Create Account")
-            create_user = st.text_input("Username", key="create_u") # User's key
-            create_pass = st.text_input("Password", type="password", key="create_p") # User's key
-            if st.form_submit_button("Create Account"):
-                if create_account(create_user, create_pass): # create_account now shows its own messages
-                    st.success("Account created! Please log in.") # Keep success message here
-                # Errors are handled by create_account or it fails silently if st.error is only in create_account
-else:
-    # --- LOGGED IN VIEW ---
-    st.sidebar.write(f"Logged in as **{st.session_state.username}**")
-    if st.sidebar.button("Logout"): logout()
-
+# Each section is a fragment so interacting with it reruns only that section
+@st.fragment
+def render_add_movie_form():
     # --- Add Movie Form ---
     with st.expander("Add a New Movie", expanded=True):
         with st.form("add_movie_form", clear_on_submit=True):
@@ -96,6 +113,7 @@ else:
                     api_data = api_client.get_movie_details(movie_title)
                     if api_data:
                         if db.add_movie(st.session_state.user_id, api_data, movie_status):
+                            bump_movies_version()
                             st.success(f"Added '{api_data.get('Title')}' to '{movie_status}'.")
                             st.rerun()
                         else:
@@ -104,38 +122,23 @@ else:
                         st.warning(f"Could not find details for '{movie_title}'.")
                 else:
                     st.warning("Please enter a movie title.")
-    
-    st.divider()
-    all_movie_data_from_db = db.get_all_movies(st.session_state.user_id)
-    df_cols = ["DB ID", "IMDb ID", "Title", "Year", "Director", "Genre", "Poster URL", "Status", "User Rating", "Date Added"]
-    
-    # FIX: Ensure df_all is always defined
-    if all_movie_data_from_db:
-        df_all = pd.DataFrame(all_movie_data_from_db, columns=df_cols)
-        df_all["Date Added"] = pd.to_datetime(df_all["Date Added"], errors='coerce') # Bug fix for DateColumn
-        df_all["User Rating"] = pd.to_numeric(df_all["User Rating"], errors='coerce')
-    else:
-        df_all = pd.DataFrame(columns=df_cols) # Initialize df_all as empty with correct columns
-
-    # Prepare df_want_to_watch with action columns
-    df_want_to_watch_base = df_all[df_all["Status"] == "Want to Watch"].copy()
-    df_want_to_watch = df_want_to_watch_base.copy() # Use .copy()
-    df_want_to_watch["Mark Watched"] = False
-    df_want_to_watch["Delete"] = False
-    
-    # Prepare df_watched with action columns
-    df_watched_base = df_all[df_all["Status"] == "Watched"].copy()
-    df_watched = df_watched_base.copy() # Use .copy()
-    df_watched["Mark Unwatched"] = False
-    df_watched["Delete"] = False
-
 
+@st.fragment
+def render_want_to_watch():
     # --- "Want to Watch" List ---
     st.header("Want to Watch")
+    page_want = select_page("Want to Watch", "want_to_watch_page")
+    df_want_to_watch = load_movies_by_status(st.session_state.user_id, "Want to Watch", st.session_state.movies_version, page_want)
+
     if not df_want_to_watch.empty:
-        editor_key_want = "want_to_watch_editor"
+        # Key carries the data version and page, so a write or page change starts the editor fresh
+        editor_key_want = f"want_to_watch_editor_v{st.session_state.movies_version}_p{page_want}"
         # User's desired display order
         cols_display_want = ["Mark Watched", "Poster URL", "Title", "Year", "Genre", "Director", "Delete"]
+        # Poster URLs are the bulk of the editor payload, so they are only sent on request
+        show_posters_want = st.toggle("Show posters", value=False, key="want_to_watch_posters")
+        if not show_posters_want:
+            cols_display_want.remove("Poster URL")
         
         config_want = {
             "DB ID": None, "IMDb ID": None, "Status": None, "User Rating": None, "Date Added": None,
@@ -147,60 +150,81 @@ else:
             "Genre": st.column_config.TextColumn(disabled=True),
             "Director": st.column_config.TextColumn(disabled=True),
         }
+        if not show_posters_want:
+            del config_want["Poster URL"]
         
         st.caption("Select actions and click 'Confirm Selections' below.")
         # Pass a DataFrame that includes "DB ID" for processing, even if hidden by config.
-        # And ensure all columns in cols_display_want are present.
-        df_for_editor_want = df_want_to_watch[cols_display_want + ["DB ID"]].copy()
+        # Project to the displayed data columns first, then add the action columns, so unused columns are never copied.
+        data_cols_want = [col for col in cols_display_want if col in df_want_to_watch.columns] + ["DB ID"]
+        df_for_editor_want = df_want_to_watch[data_cols_want].assign(**{"Mark Watched": False, "Delete": False})
 
-        edited_df_want = st.data_editor(
+        st.data_editor(
             df_for_editor_want,
             key=editor_key_want,
+            column_order=cols_display_want,
             column_config=config_want,
             use_container_width=True,
             hide_index=True,
             num_rows="fixed"
         )
 
-        if st.button("Confirm Selections", key="confirm_want_to_watch"): # User's button text, added key
-            actions_taken_want = False
-            # Iterate through the DataFrame returned by data_editor
-            for _index, row_from_editor in edited_df_want.iterrows():
-                movie_db_id = int(row_from_editor["DB ID"])
-                original_title_for_toast = row_from_editor["Title"]
+        # Only the rows the user touched are inspected; with no edits the button is disabled
+        pending_want = st.session_state.get(editor_key_want, {}).get("edited_rows") or {}
+        if st.button("Confirm Selections", key="confirm_want_to_watch", disabled=not pending_want): # User's button text, added key
+            # Collect all actions first, then write them in a single DB transaction
+            to_delete, to_move = [], []
+            # edited_rows is keyed by position in the DataFrame passed to the editor
+            db_ids = df_for_editor_want["DB ID"].to_numpy()
+            titles = df_for_editor_want["Title"].to_numpy()
+            for row_idx_str, changes in pending_want.items():
+                row_idx = int(row_idx_str)
+                movie_db_id = int(db_ids[row_idx])
+                original_title_for_toast = titles[row_idx]
 
                 # Prioritize Delete action
-                if row_from_editor["Delete"]:
-                    if db.delete_movie_by_db_id(movie_db_id):
-                        st.toast(f"Deleted '{original_title_for_toast}'.")
-                        actions_taken_want = True
+                if changes.get("Delete"):
+                    to_delete.append((movie_db_id, original_title_for_toast))
                     continue # If deleted, no other action for this movie in this pass
                 
-                if row_from_editor["Mark Watched"]:
-                    if db.update_movie_status(movie_db_id, "Watched"):
-                        # Rating will be set to NULL by default or can be edited in Watched list
-                        db.update_movie_rating(movie_db_id, None) # Explicitly clear rating
-                        st.toast(f"Moved '{original_title_for_toast}' to Watched list.")
-                        actions_taken_want = True
+                if changes.get("Mark Watched"):
+                    # Moving clears the rating; it can be set again in the Watched list
+                    to_move.append((movie_db_id, original_title_for_toast))
+
+            actions_taken_want = False
+            if (to_delete or to_move) and db.apply_movie_changes(
+                    st.session_state.user_id,
+                    delete_ids=[movie_db_id for movie_db_id, _ in to_delete],
+                    status_updates=[("Watched", movie_db_id) for movie_db_id, _ in to_move]):
+                for _, title in to_delete: st.toast(f"Deleted '{title}'.")
+                for _, title in to_move: st.toast(f"Moved '{title}' to Watched list.")
+                actions_taken_want = True
             
             if actions_taken_want:
-                # Clear session state for this editor's edits if necessary
-                if editor_key_want in st.session_state and "edited_rows" in st.session_state[editor_key_want]:
-                    del st.session_state[editor_key_want]["edited_rows"]
-                st.rerun()
+                bump_movies_version() # Also gives the editor a new key, clearing the processed edits
+                # Moves change the other list, and deletes the Danger Zone count, so those need a full rerun
+                st.rerun(scope="app" if to_move or to_delete else "fragment")
             else: st.info("No selections made in 'Want to Watch' list to process.")
     else:
         st.info("Your 'Want to Watch' list is empty!")
 
-    st.divider()
-
+@st.fragment
+def render_watched():
     # --- "Watched" List ---
     st.header("Watched Movies")
+    page_watched = select_page("Watched", "watched_page")
+    df_watched = load_movies_by_status(st.session_state.user_id, "Watched", st.session_state.movies_version, page_watched)
+
     if not df_watched.empty:
-        editor_key_watched = "watched_movies_editor"
+        # Key carries the data version and page, so a write or page change starts the editor fresh
+        editor_key_watched = f"watched_movies_editor_v{st.session_state.movies_version}_p{page_watched}"
         # User's desired display order
         cols_display_watched = ["User Rating", "Poster URL", "Title", "Year",
                                 "Genre", "Director", "Mark Unwatched", "Delete"]
+        # Poster URLs are the bulk of the editor payload, so they are only sent on request
+        show_posters_watched = st.toggle("Show posters", value=False, key="watched_posters")
+        if not show_posters_watched:
+            cols_display_watched.remove("Poster URL")
         
         config_watched = {
             "DB ID": None, "IMDb ID": None, "Status": None, "Date Added": None,
@@ -213,81 +237,133 @@ else:
             "Genre": st.column_config.TextColumn(disabled=True),
             "Director": st.column_config.TextColumn(disabled=True),
         }
+        if not show_posters_watched:
+            del config_watched["Poster URL"]
         
         st.caption("Select actions or edit ratings, then click 'Confirm Selections'.")
         # Pass a DataFrame that includes "DB ID" for processing.
-        df_for_editor_watched = df_watched[cols_display_watched + ["DB ID"]].copy()
+        # Project to the displayed data columns first, then add the action columns, so unused columns are never copied.
+        data_cols_watched = [col for col in cols_display_watched if col in df_watched.columns] + ["DB ID"]
+        df_for_editor_watched = df_watched[data_cols_watched].assign(**{"Mark Unwatched": False, "Delete": False})
         
-        # Note: st.data_editor returns the current state of the data in the editor.
-        # However, for processing edits, st.session_state[editor_key]["edited_rows"] is often more precise.
-        # The variable edited_df_watched_state isn't strictly necessary if using session_state for processing.
+        # Edits are processed from st.session_state[editor_key]["edited_rows"] rather than the returned DataFrame.
         st.data_editor( 
             df_for_editor_watched,
             key=editor_key_watched,
+            column_order=cols_display_watched,
             column_config=config_watched,
             use_container_width=True,
             hide_index=True,
             num_rows="fixed"
         )
 
-        if st.button("Confirm Selections", key="confirm_watched"): # User's button text, added key
+        # Only the rows the user touched are inspected; with no edits the button is disabled
+        pending_watched = st.session_state.get(editor_key_watched, {}).get("edited_rows") or {}
+        if st.button("Confirm Selections", key="confirm_watched", disabled=not pending_watched): # User's button text, added key
+            # Collect all actions first, then write them in a single DB transaction
+            to_delete, to_move, to_rate = [], [], []
+            raw_ratings, rated_titles = {}, {} # DB ID -> edited rating / title
+            # edited_rows is keyed by position in the DataFrame passed to the editor,
+            # so look DB IDs and titles up in plain arrays instead of per-row iloc calls.
+            db_ids = df_for_editor_watched["DB ID"].to_numpy()
+            titles = df_for_editor_watched["Title"].to_numpy()
+            for row_idx_str, changes in pending_watched.items():
+                row_idx = int(row_idx_str)
+                movie_db_id = int(db_ids[row_idx])
+                original_title = titles[row_idx]
+
+                # Prioritize Delete
+                if changes.get("Delete"): # Check if "Delete" was changed to True
+                    to_delete.append((movie_db_id, original_title))
+                    continue # If deleted, skip other actions for this movie
+
+                if changes.get("Mark Unwatched"): # Check if "Mark Unwatched" was changed to True
+                    # Moving clears the rating, so any rating change for this row is dropped.
+                    # The current logic is: delete > move > rate. This is fine.
+                    to_move.append((movie_db_id, original_title))
+                    continue 
+
+                if "User Rating" in changes:
+                    raw_ratings[movie_db_id] = changes["User Rating"]
+                    rated_titles[movie_db_id] = original_title
+
+            if raw_ratings:
+                # Coerce all edited ratings in one vectorized pass; a cleared cell (None/NaN) clears the rating
+                raw = pd.Series(raw_ratings, dtype=object)
+                ratings = pd.to_numeric(raw, errors='coerce')
+                invalid = ratings.isna() & raw.notna()
+                for movie_db_id, bad_rating in raw[invalid].items():
+                    logger.warning("Invalid rating '%s' for DB ID %s", bad_rating, movie_db_id)
+                ratings = ratings[~invalid]
+                valid = ratings.dropna()
+                to_rate = ([(None, movie_db_id) for movie_db_id in ratings.index[ratings.isna()].tolist()]
+                           + list(zip(valid.astype(int).tolist(), valid.index.tolist())))
+
             actions_taken_watched = False
-            if editor_key_watched in st.session_state and "edited_rows" in st.session_state[editor_key_watched]:
-                edited_rows_info = st.session_state[editor_key_watched]["edited_rows"]
-                # Iterate through the original df_watched indices that were edited
-                for row_idx_str, changes in edited_rows_info.items():
-                    row_idx = int(row_idx_str)
-                    
-                    # Get DB ID and original title from the DataFrame that was passed to the editor
-                    # using iloc because row_idx is the positional index in that DataFrame.
-                    movie_db_id = int(df_watched.iloc[row_idx]["DB ID"]) 
-                    original_title = df_watched.iloc[row_idx]["Title"]
-
-                    # Prioritize Delete
-                    if changes.get("Delete"): # Check if "Delete" was changed to True
-                        if db.delete_movie_by_db_id(movie_db_id):
-                            st.toast(f"Deleted '{original_title}'.")
-                            actions_taken_watched = True
-                        continue # If deleted, skip other actions for this movie
-
-                    if changes.get("Mark Unwatched"): # Check if "Mark Unwatched" was changed to True
-                        if db.update_movie_status(movie_db_id, "Want to Watch"):
-                            db.update_movie_rating(movie_db_id, None) # Clear rating
-                            st.toast(f"Moved '{original_title}' to Want to Watch.")
-                            actions_taken_watched = True
-                        # If moved, rating change for this row (if any in `changes`) might be irrelevant or could be processed.
-                        # For simplicity, if moved, we assume its rating is now None.
-                        # If "User Rating" was also in `changes` for this row, it will be for the movie *before* it was moved.
-                        # The current logic is: delete > move > rate. This is fine.
-                        continue 
-
-                    if "User Rating" in changes:
-                        new_rating = changes["User Rating"]
-                        if pd.isna(new_rating) or new_rating is None:
-                            if db.update_movie_rating(movie_db_id, None):
-                                st.toast(f"Rating cleared for '{original_title}'.")
-                                actions_taken_watched = True
-                        else:
-                            try:
-                                if db.update_movie_rating(movie_db_id, int(new_rating)):
-                                    st.toast(f"Rating updated for '{original_title}'.")
-                                    actions_taken_watched = True
-                            except ValueError:
-                                logging.warning(f"Invalid rating '{new_rating}' for DB ID {movie_db_id}")
+            if (to_delete or to_move or to_rate) and db.apply_movie_changes(
+                    st.session_state.user_id,
+                    delete_ids=[movie_db_id for movie_db_id, _ in to_delete],
+                    status_updates=[("Want to Watch", movie_db_id) for movie_db_id, _ in to_move],
+                    rating_updates=to_rate):
+                for _, title in to_delete: st.toast(f"Deleted '{title}'.")
+                for _, title in to_move: st.toast(f"Moved '{title}' to Want to Watch.")
+                for rating, movie_db_id in to_rate:
+                    title = rated_titles[movie_db_id]
+                    st.toast(f"Rating cleared for '{title}'." if rating is None else f"Rating updated for '{title}'.")
+                actions_taken_watched = True
             
             if actions_taken_watched:
-                if editor_key_watched in st.session_state and "edited_rows" in st.session_state[editor_key_watched]:
-                     del st.session_state[editor_key_watched]["edited_rows"] # Clear processed edits
-                st.rerun()
+                bump_movies_version() # Also gives the editor a new key, clearing the processed edits
+                # Moves change the other list, and deletes the Danger Zone count, so those need a full rerun
+                st.rerun(scope="app" if to_move or to_delete else "fragment")
             else:
                 st.info("No changes made in 'Watched' list to process.")
     else:
         st.info("Your 'Watched' list is empty!")
 
+st.set_page_config(page_title="Movie Tracker", layout="wide")
+st.title("Movie Tracker")
+
+if st.session_state.user_id is None:
+    st.header("Login or Create Account")
+    col1, col2 = st.columns(2)
+    with col1:
+        with st.form("login_form"):
+            st.subheader("Login")
+            login_user = st.text_input("Username", key="login_u") # User's key
+            login_pass = st.text_input("Password", type="password", key="login_p") # User's key
+            if st.form_submit_button("Login"):
+                uid, uname = authenticate(login_user, login_pass)
+                if uid:
+                    st.session_state.user_id, st.session_state.username = uid, uname
+                    st.session_state.auth_error = False
+                    st.rerun()
+                else:
+                    st.session_state.auth_error = True
+        if st.session_state.auth_error: st.error("Login failed.")
+    with col2:
+        with st.form("create_account_form"):
+            st.subheader("Create Account")
+            create_user = st.text_input("Username", key="create_u") # User's key
+            create_pass = st.text_input("Password", type="password", key="create_p") # User's key
+            if st.form_submit_button("Create Account"):
+                if create_account(create_user, create_pass): # create_account now shows its own messages
+                    st.success("Account created! Please log in.") # Keep success message here
+                # Errors are handled by create_account or it fails silently if st.error is only in create_account
+else:
+    # --- LOGGED IN VIEW ---
+    st.sidebar.write(f"Logged in as **{st.session_state.username}**")
+    if st.sidebar.button("Logout"): logout()
+
+    render_add_movie_form()
+    st.divider()
+    render_want_to_watch()
+    st.divider()
+    render_watched()
+
     st.divider()
     # --- Clear ALL Movies Button ---
-    # df_all is now guaranteed to be defined
-    if not df_all.empty: 
+    if load_movie_count(st.session_state.user_id, st.session_state.movies_version) > 0: 
         st.subheader("Danger Zone")
         if st.checkbox("Show Clear All Movies Option"):
             # Use a unique key for the button to avoid conflict if same label used elsewhere
@@ -295,8 +371,10 @@ else:
                 # Extra confirmation for safety
                 if st.checkbox("Are you absolutely sure? This cannot be undone.", key="confirm_clear_all_checkbox"): 
                     deleted_count = db.delete_all_movies_for_user(st.session_state.user_id)
+                    bump_movies_version()
                     st.success(f"Successfully cleared {deleted_count} movies.")
-                    logging.info(f"EVENT: UIClearList - UserID: {st.session_state.user_id}, DeletedCount: {deleted_count}")
+                    logger.info("EVENT: UIClearList - UserID: %s, DeletedCount: %d", st.session_state.user_id, deleted_count,
+                                extra={"event": "UIClearList", "user_id": st.session_state.user_id})
                     st.rerun()
                 else:
                     st.warning("Clear all operation cancelled (final confirmation not given).")
@@ -1,241 +1,707 @@
 # db.py
+import os
 import sqlite3
+import atexit
 import logging
-from datetime import datetime
-from passlib.hash import bcrypt
+import threading
+import queue
+from contextlib import contextmanager
+import bcrypt as _bcrypt
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 DATABASE_NAME = 'movies.db'
+SCHEMA_VERSION = 4 # Stored in PRAGMA user_version; bump when the DDL in create_database changes
+# Column order (and sqlite3.Row keys) of the movie rows returned by get_all_movies / get_movies_by_status
+MOVIE_COLUMNS = ("id", "imdb_id", "title", "year", "director", "genre", "poster_url", "status", "user_rating", "date_added")
+# bcrypt cost, tunable per deployment; hashes with a different cost are flagged by password_needs_update() and rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+_dummy_hash = None # Lazily created hash that dummy_verify() checks against
 
-def create_database():
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                hashed_password TEXT NOT NULL
-            );
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS movies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                imdb_id TEXT NOT NULL,
-                title TEXT,
-                year TEXT,
-                director TEXT,
-                genre TEXT,
-                poster_url TEXT,
-                status TEXT,
-                user_rating INTEGER, 
-                date_added TEXT,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                CONSTRAINT user_movie_unique UNIQUE (user_id, imdb_id)
-            );
-        ''')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_movies_user_id ON movies (user_id);')
-        conn.commit()
-        logging.info(f"Database '{DATABASE_NAME}' and tables 'users', 'movies' ensured (with user_rating column).")
-    except sqlite3.Error as e:
-        logging.error(f"Database error during setup: {e}")
-    finally:
-        if conn:
+# Statement text is kept in module constants so every call passes the identical string
+# and hits the connection's prepared-statement cache instead of being re-parsed.
+_MOVIE_SELECT = f"SELECT {', '.join(MOVIE_COLUMNS)} FROM movies"
+_SQL_FIND_USER = 'SELECT id, hashed_password FROM users WHERE username = ? LIMIT 1;'
+_SQL_USER_EXISTS = 'SELECT 1 FROM users WHERE username = ? LIMIT 1;'
+_SQL_ADD_USER = 'INSERT INTO users (username, hashed_password) VALUES (?, ?);'
+_SQL_UPDATE_PASSWORD = 'UPDATE users SET hashed_password = ? WHERE id = ?;'
+# date_added is INTEGER milliseconds since the Unix epoch (UTC), stamped by SQLite (2440587.5 is the epoch's Julian day)
+_SQL_NOW_MS = "CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)"
+_SQL_ADD_MOVIE = f'''
+    INSERT OR IGNORE INTO movies (user_id, imdb_id, title, year, director, genre, poster_url, status, date_added)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, {_SQL_NOW_MS});
+'''
+_SQL_GET_ALL = f'{_MOVIE_SELECT} ORDER BY date_added DESC;'
+_SQL_GET_ALL_FOR_USER = f'{_MOVIE_SELECT} WHERE user_id = ? ORDER BY date_added DESC;'
+_SQL_GET_BY_STATUS = f'{_MOVIE_SELECT} WHERE user_id = ? AND status = ? ORDER BY date_added DESC, id DESC LIMIT ? OFFSET ?;'
+_SQL_GET_BY_STATUS_AFTER = (f'{_MOVIE_SELECT} WHERE user_id = ? AND status = ? AND (date_added, id) < (?, ?) '
+                            'ORDER BY date_added DESC, id DESC LIMIT ? OFFSET ?;')
+_SQL_GET_PAGE = f'{_MOVIE_SELECT} WHERE user_id = ? ORDER BY date_added DESC, id DESC LIMIT ?;'
+_SQL_GET_PAGE_AFTER = (f'{_MOVIE_SELECT} WHERE user_id = ? AND (date_added, id) < (?, ?) '
+                       'ORDER BY date_added DESC, id DESC LIMIT ?;')
+# One fixed statement per combination of columns update_movie_fields can set
+_SQL_UPDATE_FIELDS = {
+    ("user_rating",): 'UPDATE movies SET user_rating = ? WHERE id = ?;',
+    ("status",): 'UPDATE movies SET status = ? WHERE id = ?;',
+    ("user_rating", "status"): 'UPDATE movies SET user_rating = ?, status = ? WHERE id = ?;',
+}
+_SQL_DELETE_BY_ID = 'DELETE FROM movies WHERE id = ?;'
+_SQL_DELETE_ALL_FOR_USER = 'DELETE FROM movies WHERE user_id = ?;'
+_SQL_COUNT = 'SELECT COUNT(*) FROM movies WHERE user_id = ?;'
+_SQL_COUNT_BY_STATUS = 'SELECT COUNT(*) FROM movies WHERE user_id = ? AND status = ?;'
+# apply_movie_changes checks user_id too, so an edit can only touch the signed-in user's rows
+_SQL_DELETE_FOR_USER = 'DELETE FROM movies WHERE id = ? AND user_id = ?;'
+_SQL_MOVE_FOR_USER = 'UPDATE movies SET status = ?, user_rating = NULL WHERE id = ? AND user_id = ?;'
+_SQL_RATE_FOR_USER = 'UPDATE movies SET user_rating = ? WHERE id = ? AND user_id = ?;'
+_SQL_FTS_EXISTS = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'movies_fts_ai';"
+_SQL_SEARCH = (f"SELECT {', '.join('m.' + name for name in MOVIE_COLUMNS)} "
+               'FROM movies_fts JOIN movies AS m ON m.id = movies_fts.rowid '
+               'WHERE movies_fts MATCH ? AND m.user_id = ? ORDER BY movies_fts.rank LIMIT ?;')
+STATEMENT_CACHE_SIZE = 128 # Per-connection prepared statements kept by sqlite3
+
+READ_POOL_SIZE = 4 # Reader connections; WAL lets these run alongside the single writer
+READER_WAIT_TIMEOUT = 10 # Seconds to wait for a reader when all READ_POOL_SIZE are checked out
+WAL_AUTOCHECKPOINT_PAGES = 10000 # ~40 MB of WAL before a commit checkpoints (SQLite's default is 1000); see checkpoint_db
+
+# Run as one executescript per new connection
+_CONNECTION_PRAGMAS = '''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000; -- 64 MB page cache
+    PRAGMA mmap_size=268435456; -- Read up to 256 MB of the file through mmap instead of read() copies
+    PRAGMA foreign_keys=ON; -- Enforce the ON DELETE CASCADE from movies to users
+    PRAGMA busy_timeout=5000; -- Wait up to 5 s for another writer instead of failing
+'''
+_READER_PRAGMAS = 'PRAGMA query_only=1;'
+# Only the writer commits, so only it runs automatic checkpoints
+_WRITER_PRAGMAS = f'PRAGMA wal_autocheckpoint={WAL_AUTOCHECKPOINT_PAGES};'
+
+def _connect(database_name, query_only=False):
+    """Opens and tunes a connection that may be handed between threads (callers never share one concurrently)."""
+    conn = sqlite3.connect(database_name, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row # Rows index by position (like tuples) or by column name
+    conn.executescript(_CONNECTION_PRAGMAS + (_READER_PRAGMAS if query_only else _WRITER_PRAGMAS))
+    return conn
+
+class _ConnectionPool:
+    """
+    Long-lived connections to one database file: a single writer, used under write_lock since SQLite
+    serializes writes anyway, and up to READ_POOL_SIZE query_only readers checked out one caller at a time.
+    Streamlit runs each rerun on a new thread, so connections are pooled here rather than kept per thread.
+    """
+    def __init__(self, database_name, read_pool_size=READ_POOL_SIZE, wait_timeout=READER_WAIT_TIMEOUT):
+        self.database_name = database_name
+        self.writer = _connect(database_name)
+        self.write_lock = threading.RLock()
+        self.schema_checked = False
+        self._idle_readers = queue.LifoQueue() # Most recently used first, so its page cache is warm
+        self._readers = [] # Every reader opened, idle or checked out, so close() reaches them all
+        self._readers_left = read_pool_size
+        self._wait_timeout = wait_timeout
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _checkout(self):
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._readers_left > 0
+            self._readers_left -= can_open
+        if can_open:
+            try:
+                conn = _connect(self.database_name, query_only=True)
+            except BaseException:
+                with self._lock:
+                    self._readers_left += 1 # Give the slot back so a later call can retry
+                raise
+            with self._lock:
+                self._readers.append(conn)
+            return conn
+        try:
+            return self._idle_readers.get(timeout=self._wait_timeout)
+        except queue.Empty:
+            # An sqlite3.Error, so callers' existing error handling logs it instead of the script hanging
+            raise sqlite3.OperationalError(
+                f"No reader connection became free within {self._wait_timeout} s") from None
+
+    @contextmanager
+    def reader(self):
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            if not self._closed: # close() already closed it
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle_readers.put(conn)
+
+    def close(self):
+        with self.write_lock:
+            try:
+                self.writer.execute('PRAGMA optimize;') # Refreshes planner stats the session's queries showed were stale
+            except sqlite3.Error as e:
+                logger.warning("PRAGMA optimize failed on close: %s", e)
+            self.writer.close()
+        with self._lock:
+            self._closed = True
+            readers, self._readers = self._readers, []
+        for conn in readers: # Includes readers still checked out at shutdown
             conn.close()
 
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """Returns the connection pool for DATABASE_NAME, replacing it if DATABASE_NAME changed (e.g. in tests)."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.database_name == DATABASE_NAME:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.database_name != DATABASE_NAME:
+            if _pool is not None:
+                _pool.close()
+            _pool = _ConnectionPool(DATABASE_NAME)
+        return _pool
+
+def close_connection():
+    """Closes the pooled connections, if any."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+atexit.register(close_connection) # Checkpoints the WAL on a clean interpreter exit
+
+def checkpoint_db():
+    """
+    Copies the whole WAL back into the database file and truncates it; meant for off-peak maintenance.
+    Returns True if the checkpoint completed (no reader held it back).
+    """
+    pool = _get_pool()
+    try:
+        with pool.write_lock:
+            busy, wal_pages, checkpointed = pool.writer.execute('PRAGMA wal_checkpoint(TRUNCATE);').fetchone()
+        logger.info("WAL checkpoint: busy=%s, wal_pages=%s, checkpointed=%s", busy, wal_pages, checkpointed)
+        return busy == 0
+    except sqlite3.Error as e:
+        logger.error("Database error during WAL checkpoint: %s", e)
+        return False
+
+def _read_conn():
+    """Context manager that checks out a query_only reader connection from the pool."""
+    return _get_pool().reader()
+
+@contextmanager
+def _write_tx():
+    """
+    Runs the block in a BEGIN IMMEDIATE transaction on the writer connection and yields a cursor;
+    commits on success, rolls back on error. Taking the write lock up front means a writer in another
+    process waits (busy_timeout) instead of failing mid-transaction.
+    """
+    pool = _get_pool()
+    with pool.write_lock:
+        conn = pool.writer
+        conn.execute('BEGIN IMMEDIATE;')
+        try:
+            yield conn.cursor()
+            conn.commit() # Inside the try: a failed COMMIT (busy, disk full) must not leave the shared writer mid-transaction
+        except BaseException:
+            conn.rollback()
+            raise
+
+# Current movies DDL; {table} lets the date_added migration build the replacement table under another name
+_SQL_CREATE_MOVIES = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        imdb_id TEXT NOT NULL,
+        title TEXT,
+        year TEXT,
+        director TEXT,
+        genre TEXT,
+        poster_url TEXT,
+        status TEXT,
+        user_rating INTEGER,
+        date_added INTEGER,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        CONSTRAINT user_movie_unique UNIQUE (user_id, imdb_id)
+    );
+'''
+
+def _migrate_date_added_to_ms(cursor):
+    """
+    Converts movies.date_added from ISO 8601 local-time TEXT to INTEGER epoch milliseconds.
+    Rebuilds the table (create, copy, drop, rename) since ALTER TABLE DROP COLUMN needs SQLite 3.35.
+    """
+    kept = ', '.join(['user_id'] + [name for name in MOVIE_COLUMNS if name != 'date_added'])
+    cursor.execute(_SQL_CREATE_MOVIES.format(table='movies_migrating'))
+    cursor.execute(f'''
+        INSERT INTO movies_migrating ({kept}, date_added)
+        SELECT {kept}, CAST(ROUND((julianday(date_added, 'utc') - 2440587.5) * 86400000) AS INTEGER) FROM movies;
+    ''')
+    cursor.execute('DROP TABLE movies;') # Also drops its indexes and triggers; the caller recreates them
+    cursor.execute('ALTER TABLE movies_migrating RENAME TO movies;')
+    logger.info("Migrated movies.date_added to epoch milliseconds.")
+
+def _create_movies_fts(cursor):
+    """
+    Creates movies_fts, an FTS5 index over title/director/genre that reads its text from movies,
+    plus the triggers that keep it in sync, and (re)builds it from the existing rows.
+    """
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts
+        USING fts5(title, director, genre, content='movies', content_rowid='id');
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_ai AFTER INSERT ON movies BEGIN
+            INSERT INTO movies_fts (rowid, title, director, genre) VALUES (new.id, new.title, new.director, new.genre);
+        END;
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_ad AFTER DELETE ON movies BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title, director, genre)
+            VALUES ('delete', old.id, old.title, old.director, old.genre);
+        END;
+    ''')
+    # Only fires for the indexed columns, so status and rating edits don't touch the FTS index
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_au AFTER UPDATE OF title, director, genre ON movies BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title, director, genre)
+            VALUES ('delete', old.id, old.title, old.director, old.genre);
+            INSERT INTO movies_fts (rowid, title, director, genre) VALUES (new.id, new.title, new.director, new.genre);
+        END;
+    ''')
+    cursor.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild');")
+
+def _create_schema(cursor):
+    """Runs the DDL and migrations that bring the file up to SCHEMA_VERSION, ending with the user_version bump."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            hashed_password TEXT NOT NULL
+        );
+    ''')
+    cursor.execute(_SQL_CREATE_MOVIES.format(table='movies'))
+    # Both list queries order by date_added (then id, the rowid), so scanning these indexes backwards needs no sort step.
+    # user_id-only lookups are served by the prefix of these (and of the user_movie_unique index).
+    cursor.execute('DROP INDEX IF EXISTS idx_movies_user_id;')
+    cursor.execute('DROP INDEX IF EXISTS idx_movies_user_status;')
+    date_added_type = next(row["type"] for row in cursor.execute('PRAGMA table_info(movies);') if row["name"] == "date_added")
+    if date_added_type.upper() == 'TEXT': # Created before schema version 3
+        _migrate_date_added_to_ms(cursor)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_movies_user_date ON movies (user_id, date_added);')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_movies_user_status_date ON movies (user_id, status, date_added);')
+    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION};')
+
+def _ensure_movies_fts(conn):
+    """
+    Creates the search index if it (or its triggers, which a movies table rebuild drops) is missing.
+    Runs after the core schema commits, so a SQLite build without FTS5 only loses search_movies.
+    """
+    if conn.execute(_SQL_FTS_EXISTS).fetchone():
+        return
+    try:
+        with _write_tx() as cursor:
+            _create_movies_fts(cursor)
+    except sqlite3.OperationalError as e:
+        logger.warning("Movie search disabled, could not create the FTS5 index: %s", e)
+
+def create_database():
+    """Creates the tables and indexes, skipping the DDL when the file is already at SCHEMA_VERSION."""
+    pool = _get_pool()
+    if pool.schema_checked: # Already verified for this database file (app.py calls this every rerun)
+        return
+    try:
+        with pool.write_lock:
+            if pool.writer.execute('PRAGMA user_version;').fetchone()[0] < SCHEMA_VERSION:
+                # DDL and user_version are transactional in SQLite, so a failed migration rolls back
+                # to the old schema and version instead of leaving the table half-converted
+                with _write_tx() as cursor:
+                    _create_schema(cursor)
+                pool.writer.execute('ANALYZE;') # Refresh planner statistics for the new indexes
+            _ensure_movies_fts(pool.writer)
+            pool.schema_checked = True
+        logger.info("Database '%s' and tables 'users', 'movies' ensured (with user_rating column).", DATABASE_NAME)
+    except sqlite3.Error as e:
+        logger.error("Database error during setup: %s", e)
+
+# --- Password Hashing ---
+BCRYPT_MAX_PASSWORD_BYTES = 72 # bcrypt only uses this many bytes of the password
+
+def _password_bytes(password):
+    """
+    UTF-8 password truncated to what bcrypt uses. bcrypt >= 5 raises instead of truncating, and hashes made
+    through passlib (which truncated) must keep verifying, so both hashing and checking cut here.
+    """
+    return password.encode('utf-8')[:BCRYPT_MAX_PASSWORD_BYTES]
+
+def hash_password(password):
+    """bcrypt-hashes a password at BCRYPT_ROUNDS."""
+    return _bcrypt.hashpw(_password_bytes(password), _bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def verify_password(password, hashed_password):
+    """Checks a password against a stored bcrypt hash. Raises ValueError if the hash is malformed."""
+    return _bcrypt.checkpw(_password_bytes(password), hashed_password.encode('utf-8'))
+
+def password_needs_update(hashed_password):
+    """True when a stored hash ($2b$<cost>$...) was made with a cost other than BCRYPT_ROUNDS."""
+    parts = hashed_password.split('$')
+    return len(parts) < 4 or parts[2] != f"{BCRYPT_ROUNDS:02d}"
+
+def dummy_verify():
+    """Takes as long as a real verify_password call; used when the username doesn't exist."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password("dummy-password")
+    verify_password("not-the-password", _dummy_hash)
+    return False
+
 # --- User Management Functions ---
+def _log_user_exists(username):
+    logger.warning("EVENT: UserCreationFailed - Username: %s, Reason: AlreadyExists", username,
+                   extra={"event": "UserCreationFailed"})
+
 def add_user(username, password):
-    conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        hashed_password = bcrypt.hash(password)
-        cursor.execute('INSERT INTO users (username, hashed_password) VALUES (?, ?)', (username, hashed_password))
-        conn.commit()
+        # Sign-up already reveals taken names, so skip the bcrypt cost for them
+        with _read_conn() as conn:
+            if conn.execute(_SQL_USER_EXISTS, (username,)).fetchone() is not None:
+                _log_user_exists(username)
+                return None
+        hashed_password = hash_password(password)
+        with _write_tx() as cursor:
+            cursor.execute(_SQL_ADD_USER, (username, hashed_password))
         user_id = cursor.lastrowid 
-        logging.info(f"Successfully added user: {username} with ID: {user_id}")
-        logging.info(f"EVENT: UserCreated - Username: {username}, UserID: {user_id}")
+        logger.info("EVENT: UserCreated - Username: %s, UserID: %s", username, user_id,
+                    extra={"event": "UserCreated", "user_id": user_id})
         return user_id
-    except sqlite3.IntegrityError: 
-        logging.warning(f"Attempted to add existing username: {username}")
-        logging.info(f"EVENT: UserCreationFailed - Username: {username}, Reason: AlreadyExists")
+    except sqlite3.IntegrityError: # Another sign-up took the name between the check and the insert
+        _log_user_exists(username)
         return None
     except sqlite3.Error as e:
-        logging.error(f"Database error adding user {username}: {e}")
+        logger.error("Database error adding user %s: %s", username, e)
         return None
-    finally:
-        if conn:
-            conn.close()
+
+def update_user_password(user_id, password):
+    """Re-hashes a user's password at the current BCRYPT_ROUNDS and stores it."""
+    try:
+        hashed_password = hash_password(password)
+        with _write_tx() as cursor:
+            cursor.execute(_SQL_UPDATE_PASSWORD, (hashed_password, user_id))
+        if cursor.rowcount > 0:
+            logger.info("EVENT: UserPasswordRehashed - UserID: %s", user_id,
+                        extra={"event": "UserPasswordRehashed", "user_id": user_id})
+            return True
+        logger.warning("No user found with ID %s to update password.", user_id)
+        return False
+    except sqlite3.Error as e:
+        logger.error("Database error updating password for user %s: %s", user_id, e)
+        return False
 
 def find_user_by_username(username):
-    conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, hashed_password FROM users WHERE username = ?', (username,))
-        user_data = cursor.fetchone()
+        with _read_conn() as conn:
+            user_data = conn.execute(_SQL_FIND_USER, (username,)).fetchone()
         if user_data:
             user_id, hashed_password = user_data
-            logging.info(f"Found user by username: {username}")
+            logger.info("Found user by username: %s", username)
             return user_id, hashed_password
         else:
-            logging.info(f"User not found: {username}")
+            logger.info("User not found: %s", username)
             return None, None
     except sqlite3.Error as e:
-        logging.error(f"Database error finding user {username}: {e}")
+        logger.error("Database error finding user %s: %s", username, e)
         return None, None
-    finally:
-        if conn:
-            conn.close()
+
+def verify_user(username, password):
+    """
+    Returns the user's id if password is correct, else None. Always spends one bcrypt check, even for an
+    unknown username, and upgrades the stored hash if it was made with a different BCRYPT_ROUNDS.
+    """
+    user_id, hashed_password = find_user_by_username(username)
+    if user_id is None:
+        dummy_verify()
+        return None
+    try:
+        if not verify_password(password, hashed_password):
+            return None
+    except ValueError: # Malformed stored hash
+        logger.warning("Stored password hash for user %s is not a valid bcrypt hash.", user_id)
+        return None
+    if password_needs_update(hashed_password):
+        update_user_password(user_id, password)
+    return user_id
 
 # --- Movie Management Functions ---
 def add_movie(user_id, movie_data, status):
+    title, imdb_id = movie_data.get('Title'), movie_data.get('imdbID')
     if user_id is None:
-        logging.info(f"EVENT: MovieAddFailed - Reason: NoUserIDProvided, Title: {movie_data.get('Title')}, Status: {status}")
-        logging.error("Cannot add movie without a valid user_id.")
+        logger.error("EVENT: MovieAddFailed - Reason: NoUserIDProvided, Title: %s, Status: %s", title, status,
+                     extra={"event": "MovieAddFailed"})
         return False
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO movies (user_id, imdb_id, title, year, director, genre, poster_url, status, date_added)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id, movie_data.get('imdbID'), movie_data.get('Title'),
-            movie_data.get('Year'), movie_data.get('Director'), movie_data.get('Genre'),
-            movie_data.get('Poster'), status, datetime.now().isoformat()
-        ))
-        conn.commit()
-        if cursor.rowcount > 0:
-            logging.info(f"Successfully added movie for user {user_id}: {movie_data.get('Title')} ({movie_data.get('imdbID')}) with status '{status}'")
-            logging.info(f"EVENT: MovieAdded - UserID: {user_id}, Title: {movie_data.get('Title')}, IMDbID: {movie_data.get('imdbID')}, Status: {status}")
-            return True
-        else:
-            logging.info(f"Movie already exists for user {user_id}: {movie_data.get('Title')} ({movie_data.get('imdbID')}). Insert ignored.")
-            logging.info(f"EVENT: MovieIgnoredDuplicateForUser - UserID: {user_id}, Title: {movie_data.get('Title')}, IMDbID: {movie_data.get('imdbID')}")
-            return False
+    try:
+        with _write_tx() as cursor:
+            cursor.execute(_SQL_ADD_MOVIE, (
+                user_id, imdb_id, title,
+                movie_data.get('Year'), movie_data.get('Director'), movie_data.get('Genre'),
+                movie_data.get('Poster'), status
+            ))
+        added = cursor.rowcount > 0 # 0 when the user already has the movie and the row was ignored
+        if logger.isEnabledFor(logging.INFO): # Skip building the extra dicts when INFO is off
+            if added:
+                logger.info("EVENT: MovieAdded - UserID: %s, MovieDBID: %s, Title: %s, IMDbID: %s, Status: %s",
+                            user_id, cursor.lastrowid, title, imdb_id, status,
+                            extra={"event": "MovieAdded", "user_id": user_id})
+            else:
+                logger.info("EVENT: MovieIgnoredDuplicateForUser - UserID: %s, Title: %s, IMDbID: %s",
+                            user_id, title, imdb_id,
+                            extra={"event": "MovieIgnoredDuplicateForUser", "user_id": user_id})
+        return added
     except sqlite3.Error as e:
-        logging.error(f"Database error adding movie {movie_data.get('Title')} for user {user_id}: {e}")
-        logging.info(f"EVENT: MovieAddFailed - UserID: {user_id}, Title: {movie_data.get('Title')}, Status: {status}, Reason: DBError - {e}")
+        logger.error("EVENT: MovieAddFailed - UserID: %s, Title: %s, Status: %s, Reason: DBError - %s",
+                     user_id, title, status, e,
+                     extra={"event": "MovieAddFailed", "user_id": user_id})
         return False
-    finally:
-        if conn:
-            conn.close()
+
+def add_movies_bulk(user_id, movies, status):
+    """
+    Inserts many OMDb movie dicts for one user in a single transaction, ignoring ones the user already has.
+    Returns the number of movies actually added.
+    """
+    if user_id is None:
+        logger.error("EVENT: MoviesBulkAddFailed - Reason: NoUserIDProvided", extra={"event": "MoviesBulkAddFailed"})
+        return 0
+    rows = [(user_id, m.get('imdbID'), m.get('Title'), m.get('Year'), m.get('Director'), m.get('Genre'),
+             m.get('Poster'), status) for m in movies]
+    if not rows:
+        return 0
+    try:
+        with _write_tx() as cursor:
+            cursor.executemany(_SQL_ADD_MOVIE, rows)
+            added_count = cursor.rowcount
+        logger.info("EVENT: MoviesBulkAdded - UserID: %s, Status: %s, Added: %d, Ignored: %d",
+                    user_id, status, added_count, len(rows) - added_count,
+                    extra={"event": "MoviesBulkAdded", "user_id": user_id})
+        return added_count
+    except sqlite3.Error as e:
+        logger.error("EVENT: MoviesBulkAddFailed - UserID: %s, Count: %d, Reason: DBError - %s", user_id, len(rows), e,
+                     extra={"event": "MoviesBulkAddFailed", "user_id": user_id})
+        return 0
+
+def _iter_movies(user_id):
+    """Yields movie rows newest first straight from the cursor; all users' movies when user_id is None."""
+    with _read_conn() as conn: # Held until the rows are exhausted or the generator is closed
+        if user_id is None:
+            yield from conn.execute(_SQL_GET_ALL)
+        else:
+            yield from conn.execute(_SQL_GET_ALL_FOR_USER, (user_id,))
+
+def iter_all_movies(user_id=None):
+    """Streams movie rows without building a list first; all users' movies when user_id is None."""
+    count = 0
+    try:
+        for row in _iter_movies(user_id):
+            count += 1
+            yield row
+        logger.info("EVENT: MoviesStreamed - UserID: %s, Count: %d", user_id, count,
+                    extra={"event": "MoviesStreamed", "user_id": user_id})
+    except sqlite3.Error as e:
+        logger.error("EVENT: MoviesGetFailed - UserID: %s, Reason: DBError - %s", user_id, e,
+                     extra={"event": "MoviesGetFailed", "user_id": user_id})
 
 def get_all_movies(user_id):
     if user_id is None:
-        logging.info(f"EVENT: MoviesGetFailed - Reason: NoUserIDProvided")
-        logging.error("Cannot get movies without a valid user_id.")
+        logger.error("EVENT: MoviesGetFailed - Reason: NoUserIDProvided", extra={"event": "MoviesGetFailed"})
         return []
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, imdb_id, title, year, director, genre, poster_url, status, user_rating, date_added 
-            FROM movies 
-            WHERE user_id = ? 
-            ORDER BY date_added DESC;
-        ''', (user_id,))
-        rows = cursor.fetchall()
-        logging.info(f"Fetched {len(rows)} movies for user {user_id}.")
-        logging.info(f"EVENT: MoviesFetched - UserID: {user_id}, Count: {len(rows)}")
+    try:
+        rows = list(_iter_movies(user_id))
+        logger.info("EVENT: MoviesFetched - UserID: %s, Count: %d", user_id, len(rows),
+                    extra={"event": "MoviesFetched", "user_id": user_id})
         return rows
     except sqlite3.Error as e:
-        logging.error(f"Database error fetching movies for user {user_id}: {e}")
-        logging.info(f"EVENT: MoviesGetFailed - UserID: {user_id}, Reason: DBError - {e}")
+        logger.error("EVENT: MoviesGetFailed - UserID: %s, Reason: DBError - %s", user_id, e,
+                     extra={"event": "MoviesGetFailed", "user_id": user_id})
         return []
-    finally:
-        if conn:
-            conn.close()
 
-def update_movie_rating(movie_db_id, user_rating):
-    conn = None
+def get_movies_page(user_id, limit=50, after=None):
+    """
+    Returns up to limit of a user's movies across all lists, newest first.
+    For the next page pass after=(date_added, id) of the last row returned; each page costs O(limit).
+    """
+    if user_id is None:
+        logger.error("EVENT: MoviesGetFailed - Reason: NoUserIDProvided", extra={"event": "MoviesGetFailed"})
+        return []
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE movies SET user_rating = ? WHERE id = ?', (user_rating, movie_db_id))
-        conn.commit()
-        if cursor.rowcount > 0:
-            logging.info(f"Successfully updated rating for movie_db_id {movie_db_id} to {user_rating}.")
-            logging.info(f"EVENT: MovieRatingUpdated - MovieDBID: {movie_db_id}, Rating: {user_rating}")
-            return True
-        return False 
+        with _read_conn() as conn:
+            if after is None:
+                rows = conn.execute(_SQL_GET_PAGE, (user_id, limit)).fetchall()
+            else:
+                rows = conn.execute(_SQL_GET_PAGE_AFTER, (user_id, *after, limit)).fetchall()
+        logger.info("EVENT: MoviesPageFetched - UserID: %s, Count: %d", user_id, len(rows),
+                    extra={"event": "MoviesPageFetched", "user_id": user_id})
+        return rows
     except sqlite3.Error as e:
-        logging.error(f"Database error updating rating for movie_db_id {movie_db_id}: {e}")
-        logging.info(f"EVENT: MovieRatingUpdateFailed - MovieDBID: {movie_db_id}, Rating: {user_rating}, Reason: DBError - {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        logger.error("EVENT: MoviesGetFailed - UserID: %s, Reason: DBError - %s", user_id, e,
+                     extra={"event": "MoviesGetFailed", "user_id": user_id})
+        return []
 
-def update_movie_status(movie_db_id, new_status):
-    """Updates the status of a specific movie entry."""
-    conn = None
+def get_movies_by_status(user_id, status, limit=None, offset=0, after=None):
+    """
+    Returns a user's movies with the given status, newest first, in the same column order as get_all_movies.
+    Pass limit/offset for a page, or limit plus after=(date_added, id) of the last row seen for keyset paging.
+    """
+    if user_id is None:
+        logger.error("EVENT: MoviesGetFailed - Reason: NoUserIDProvided", extra={"event": "MoviesGetFailed"})
+        return []
+    limit = -1 if limit is None else limit # LIMIT -1 means no limit in SQLite
+    try:
+        with _read_conn() as conn:
+            if after is None:
+                rows = conn.execute(_SQL_GET_BY_STATUS, (user_id, status, limit, offset)).fetchall()
+            else:
+                rows = conn.execute(_SQL_GET_BY_STATUS_AFTER, (user_id, status, *after, limit, offset)).fetchall()
+        logger.info("EVENT: MoviesFetchedByStatus - UserID: %s, Status: %s, Count: %d", user_id, status, len(rows),
+                    extra={"event": "MoviesFetchedByStatus", "user_id": user_id})
+        return rows
+    except sqlite3.Error as e:
+        logger.error("EVENT: MoviesGetFailed - UserID: %s, Status: %s, Reason: DBError - %s", user_id, status, e,
+                     extra={"event": "MoviesGetFailed", "user_id": user_id})
+        return []
+
+def _fts_match_expression(text):
+    """Turns free text into an FTS5 query: every word must match as a prefix, with FTS syntax characters quoted."""
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
+
+def search_movies(user_id, query, limit=50):
+    """Returns a user's movies whose title, director or genre match every word of query, best match first."""
+    if user_id is None:
+        logger.error("EVENT: MovieSearchFailed - Reason: NoUserIDProvided", extra={"event": "MovieSearchFailed"})
+        return []
+    match = _fts_match_expression(query)
+    if not match:
+        return []
+    try:
+        with _read_conn() as conn:
+            rows = conn.execute(_SQL_SEARCH, (match, user_id, limit)).fetchall()
+        logger.info("EVENT: MovieSearch - UserID: %s, Query: %s, Count: %d", user_id, query, len(rows),
+                    extra={"event": "MovieSearch", "user_id": user_id})
+        return rows
+    except sqlite3.Error as e:
+        logger.error("EVENT: MovieSearchFailed - UserID: %s, Query: %s, Reason: DBError - %s", user_id, query, e,
+                     extra={"event": "MovieSearchFailed", "user_id": user_id})
+        return []
+
+def get_movies_by_status_columnar(user_id, status, limit=None, offset=0, after=None):
+    """Same rows as get_movies_by_status, returned as {column name: list of values} for building a DataFrame."""
+    rows = get_movies_by_status(user_id, status, limit=limit, offset=offset, after=after)
+    columns = zip(*rows) if rows else ([] for _ in MOVIE_COLUMNS)
+    return {name: list(values) for name, values in zip(MOVIE_COLUMNS, columns)}
+
+def count_movies(user_id, status=None):
+    """Returns how many movies a user has, across all lists or only those with the given status."""
+    if user_id is None:
+        logger.error("Cannot count movies without a valid user_id.")
+        return 0
+    try:
+        with _read_conn() as conn:
+            if status is None:
+                return conn.execute(_SQL_COUNT, (user_id,)).fetchone()[0]
+            return conn.execute(_SQL_COUNT_BY_STATUS, (user_id, status)).fetchone()[0]
+    except sqlite3.Error as e:
+        logger.error("Database error counting movies for user %s: %s", user_id, e)
+        return 0
+
+_UNSET = object() # Marks an update_movie_fields argument that wasn't passed (None is a valid rating)
+
+def update_movie_fields(movie_db_id, user_rating=_UNSET, status=_UNSET):
+    """
+    Sets a movie's rating and/or status in one UPDATE and transaction; only the arguments passed are changed.
+    Pass user_rating=None to clear the rating.
+    """
+    fields = {name: value for name, value in (("user_rating", user_rating), ("status", status)) if value is not _UNSET}
+    if not fields:
+        return False
+    query = _SQL_UPDATE_FIELDS[tuple(fields)]
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE movies SET status = ? WHERE id = ?;', (new_status, movie_db_id))
-        conn.commit()
+        with _write_tx() as cursor:
+            cursor.execute(query, (*fields.values(), movie_db_id))
         if cursor.rowcount > 0:
-            logging.info(f"Successfully updated status for movie DB ID {movie_db_id} to '{new_status}'.")
-            logging.info(f"EVENT: MovieStatusUpdated - MovieDBID: {movie_db_id}, NewStatus: {new_status}")
+            logger.info("EVENT: MovieFieldsUpdated - MovieDBID: %s, Fields: %s", movie_db_id, fields,
+                        extra={"event": "MovieFieldsUpdated"})
             return True
-        logging.warning(f"No movie found with DB ID {movie_db_id} to update status or status was the same.")
+        logger.warning("No movie found with DB ID %s to update.", movie_db_id)
         return False
     except sqlite3.Error as e:
-        logging.error(f"Database error updating status for movie DB ID {movie_db_id}: {e}")
-        logging.info(f"EVENT: MovieStatusUpdateFailed - MovieDBID: {movie_db_id}, NewStatus: {new_status}, Reason: DBError - {e}")
+        logger.error("EVENT: MovieFieldsUpdateFailed - MovieDBID: %s, Fields: %s, Reason: DBError - %s", movie_db_id, fields, e,
+                     extra={"event": "MovieFieldsUpdateFailed"})
         return False
-    finally:
-        if conn:
-            conn.close()
+
+def update_movie_rating(movie_db_id, user_rating):
+    return update_movie_fields(movie_db_id, user_rating=user_rating)
+
+def update_movie_status(movie_db_id, new_status):
+    """Updates the status of a specific movie entry."""
+    return update_movie_fields(movie_db_id, status=new_status)
 
 def delete_movie_by_db_id(movie_db_id):
     """Deletes a single movie entry by its database primary key."""
-    conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM movies WHERE id = ?;', (movie_db_id,))
-        conn.commit()
+        with _write_tx() as cursor:
+            cursor.execute(_SQL_DELETE_BY_ID, (movie_db_id,))
         if cursor.rowcount > 0:
-            logging.info(f"Successfully deleted movie with DB ID: {movie_db_id}")
-            logging.info(f"EVENT: MovieDeletedByDBID - MovieDBID: {movie_db_id}")
+            logger.info("EVENT: MovieDeletedByDBID - MovieDBID: %s", movie_db_id,
+                        extra={"event": "MovieDeletedByDBID"})
             return True
-        logging.warning(f"No movie found with DB ID: {movie_db_id} to delete.")
+        logger.warning("No movie found with DB ID: %s to delete.", movie_db_id)
         return False
     except sqlite3.Error as e:
-        logging.error(f"Database error deleting movie DB ID {movie_db_id}: {e}")
-        logging.info(f"EVENT: MovieDeleteByDBIDFailed - MovieDBID: {movie_db_id}, Reason: DBError - {e}")
+        logger.error("EVENT: MovieDeleteByDBIDFailed - MovieDBID: %s, Reason: DBError - %s", movie_db_id, e,
+                     extra={"event": "MovieDeleteByDBIDFailed"})
         return False
-    finally:
-        if conn:
-            conn.close()
 
 def delete_all_movies_for_user(user_id):
     if user_id is None:
-        logging.info(f"EVENT: MoviesDeleteFailed - Reason: NoUserIDProvided")
-        logging.error("Cannot delete movies without a valid user_id.")
+        logger.error("EVENT: MoviesDeleteFailed - Reason: NoUserIDProvided", extra={"event": "MoviesDeleteFailed"})
         return 0 
-    conn = None
     deleted_count = 0
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM movies WHERE user_id = ?;', (user_id,))
-        deleted_count = cursor.rowcount
-        conn.commit()
-        logging.info(f"Successfully deleted {deleted_count} movies for user {user_id}.")
-        logging.info(f"EVENT: MoviesDeleted - UserID: {user_id}, Count: {deleted_count}")
+        with _write_tx() as cursor:
+            cursor.execute(_SQL_DELETE_ALL_FOR_USER, (user_id,))
+            deleted_count = cursor.rowcount
+        logger.info("EVENT: MoviesDeleted - UserID: %s, Count: %d", user_id, deleted_count,
+                    extra={"event": "MoviesDeleted", "user_id": user_id})
         return deleted_count
     except sqlite3.Error as e:
-        logging.error(f"Database error deleting movies for user {user_id}: {e}")
-        logging.info(f"EVENT: MoviesDeleteFailed - UserID: {user_id}, Reason: DBError - {e}")
+        logger.error("EVENT: MoviesDeleteFailed - UserID: %s, Reason: DBError - %s", user_id, e,
+                     extra={"event": "MoviesDeleteFailed", "user_id": user_id})
         return 0 
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+
+def apply_movie_changes(user_id, delete_ids=(), status_updates=(), rating_updates=()):
+    """
+    Applies a batch of list edits for one user in a single transaction.
+    status_updates is a list of (new_status, movie_db_id); moving a movie also clears its rating.
+    rating_updates is a list of (user_rating, movie_db_id).
+    """
+    if user_id is None:
+        logger.error("EVENT: MovieChangesFailed - Reason: NoUserIDProvided", extra={"event": "MovieChangesFailed"})
+        return False
+    try:
+        with _write_tx() as cursor:
+            cursor.executemany(_SQL_DELETE_FOR_USER, [(movie_db_id, user_id) for movie_db_id in delete_ids])
+            cursor.executemany(_SQL_MOVE_FOR_USER,
+                               [(new_status, movie_db_id, user_id) for new_status, movie_db_id in status_updates])
+            cursor.executemany(_SQL_RATE_FOR_USER,
+                               [(user_rating, movie_db_id, user_id) for user_rating, movie_db_id in rating_updates])
+        logger.info("EVENT: MovieChangesApplied - UserID: %s, Deleted: %d, StatusUpdated: %d, RatingUpdated: %d",
+                    user_id, len(delete_ids), len(status_updates), len(rating_updates),
+                    extra={"event": "MovieChangesApplied", "user_id": user_id})
+        return True
+    except sqlite3.Error as e:
+        logger.error("EVENT: MovieChangesFailed - UserID: %s, Reason: DBError - %s", user_id, e,
+                     extra={"event": "MovieChangesFailed", "user_id": user_id})
+        return False
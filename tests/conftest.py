@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Lets the test modules import db, api_client and app from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
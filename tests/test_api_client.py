@@ -1,10 +1,8 @@
 import pytest
 import requests
 from unittest.mock import patch, MagicMock
-import sys
-import os # Required for sys.path modification
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import api_client
+from diskcache import Cache
 
 # Sample successful API response
 SUCCESS_RESPONSE_JSON = {
@@ -41,6 +39,26 @@ NOT_FOUND_RESPONSE_JSON = {
     "Error": "Movie not found!"
 }
 
+@pytest.fixture(autouse=True)
+def isolated_omdb_cache(monkeypatch, tmp_path):
+    """Gives each test its own empty OMDb response cache."""
+    cache = Cache(str(tmp_path / "omdb_cache"))
+    monkeypatch.setattr(api_client, '_cache', cache)
+    yield cache
+    cache.close()
+
+def test_omdb_cache_opens_lazily(monkeypatch, tmp_path):
+    cache_dir = tmp_path / "lazy_cache"
+    monkeypatch.setattr(api_client, 'OMDB_CACHE_DIR', str(cache_dir))
+    monkeypatch.setattr(api_client, '_cache', None)
+    assert not cache_dir.exists()
+    cache = api_client._get_cache()
+    try:
+        assert cache_dir.is_dir()
+        assert api_client._get_cache() is cache # Opened once, then reused
+    finally:
+        cache.close()
+
 @pytest.fixture
 def mock_api_key_present(monkeypatch):
     """Mocks api_client.OMDB_API_KEY to simulate a key being present."""
@@ -52,7 +70,7 @@ def mock_api_key_missing(monkeypatch):
     monkeypatch.setattr(api_client, 'OMDB_API_KEY', None)
 
 
-@patch('requests.get')
+@patch('api_client._SESSION.get')
 def test_get_movie_details_success(mock_get, mock_api_key_present):
     # mock_api_key_present fixture ensures api_client.OMDB_API_KEY is set
     mock_response = MagicMock()
@@ -66,7 +84,8 @@ def test_get_movie_details_success(mock_get, mock_api_key_present):
 
     mock_get.assert_called_once_with(
         'https://www.omdbapi.com/', # Using the HTTPS URL from api_client.py
-        params={'t': title, 'apikey': 'fake_test_key', 'plot': 'short', 'r': 'json'}
+        params={'t': title, 'apikey': 'fake_test_key', 'plot': 'short', 'r': 'json'},
+        timeout=api_client.OMDB_TIMEOUT
     )
 
     assert movie_data is not None
@@ -75,7 +94,7 @@ def test_get_movie_details_success(mock_get, mock_api_key_present):
     assert movie_data['Director'] == "Christopher Nolan"
 
 
-@patch('requests.get')
+@patch('api_client._SESSION.get')
 def test_get_movie_details_not_found(mock_get, mock_api_key_present):
     # mock_api_key_present fixture ensures api_client.OMDB_API_KEY is set
     mock_response = MagicMock()
@@ -89,11 +108,12 @@ def test_get_movie_details_not_found(mock_get, mock_api_key_present):
 
     mock_get.assert_called_once_with(
         'https://www.omdbapi.com/',
-        params={'t': title, 'apikey': 'fake_test_key', 'plot': 'short', 'r': 'json'}
+        params={'t': title, 'apikey': 'fake_test_key', 'plot': 'short', 'r': 'json'},
+        timeout=api_client.OMDB_TIMEOUT
     )
     assert movie_data is None
 
-@patch('requests.get')
+@patch('api_client._SESSION.get')
 def test_get_movie_details_http_error(mock_get, mock_api_key_present):
     # mock_api_key_present fixture ensures api_client.OMDB_API_KEY is set
     mock_get.side_effect = requests.exceptions.RequestException("Simulated HTTP error")
@@ -103,6 +123,79 @@ def test_get_movie_details_http_error(mock_get, mock_api_key_present):
 
     mock_get.assert_called_once_with(
         'https://www.omdbapi.com/',
-        params={'t': title, 'apikey': 'fake_test_key', 'plot': 'short', 'r': 'json'}
+        params={'t': title, 'apikey': 'fake_test_key', 'plot': 'short', 'r': 'json'},
+        timeout=api_client.OMDB_TIMEOUT
     )
     assert movie_data is None
+
+@patch('api_client._SESSION.get')
+def test_get_movie_details_uses_cache(mock_get, mock_api_key_present):
+    mock_response = MagicMock()
+    mock_response.json.return_value = SUCCESS_RESPONSE_JSON
+    mock_response.raise_for_status.return_value = None
+    mock_get.return_value = mock_response
+
+    first = api_client.get_movie_details("Inception")
+    second = api_client.get_movie_details("  inception ") # Normalized to the same cache key
+
+    mock_get.assert_called_once()
+    assert first == second
+    assert second['imdbID'] == "tt1375666"
+
+@patch('api_client._SESSION.get')
+def test_get_movie_details_survives_broken_cache(mock_get, mock_api_key_present, monkeypatch, tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("") # A file where the cache directory should be, so the cache can't be opened
+    monkeypatch.setattr(api_client, 'OMDB_CACHE_DIR', str(blocker / "omdb_cache"))
+    monkeypatch.setattr(api_client, '_cache', None)
+    mock_response = MagicMock()
+    mock_response.json.return_value = SUCCESS_RESPONSE_JSON
+    mock_response.raise_for_status.return_value = None
+    mock_get.return_value = mock_response
+
+    # Neither the failed read nor the failed write turns a successful fetch into an error or None
+    assert api_client.get_movie_details("Inception")['imdbID'] == "tt1375666"
+    assert [m['imdbID'] for m in api_client.get_movie_details_batch(["Inception", "Inception"])] == ["tt1375666"] * 2
+
+@patch('api_client._SESSION.get')
+def test_get_movie_details_caches_not_found(mock_get, mock_api_key_present):
+    mock_response = MagicMock()
+    mock_response.json.return_value = NOT_FOUND_RESPONSE_JSON
+    mock_response.raise_for_status.return_value = None
+    mock_get.return_value = mock_response
+
+    assert api_client.get_movie_details("Movie That Does Not Exist 12345") is None
+    assert api_client.get_movie_details("Movie That Does Not Exist 12345") is None
+    mock_get.assert_called_once()
+
+@patch('api_client._SESSION.get')
+def test_get_movie_details_does_not_cache_request_errors(mock_get, mock_api_key_present):
+    mock_get.side_effect = requests.exceptions.RequestException("Simulated HTTP error")
+
+    assert api_client.get_movie_details("Any Movie") is None
+    assert api_client.get_movie_details("Any Movie") is None
+    assert mock_get.call_count == 2
+
+@patch('api_client._SESSION.get')
+def test_get_movie_details_batch_preserves_order(mock_get, mock_api_key_present):
+    def fake_get(url, params, timeout):
+        mock_response = MagicMock()
+        mock_response.raise_for_status.return_value = None
+        if params['t'] == "Inception":
+            mock_response.json.return_value = SUCCESS_RESPONSE_JSON
+        else:
+            mock_response.json.return_value = NOT_FOUND_RESPONSE_JSON
+        return mock_response
+    mock_get.side_effect = fake_get
+
+    titles = ["Movie That Does Not Exist 12345", "Inception", "Another Missing Movie"]
+    results = api_client.get_movie_details_batch(titles)
+
+    assert mock_get.call_count == 3
+    assert len(results) == 3
+    assert results[0] is None
+    assert results[1]['imdbID'] == "tt1375666"
+    assert results[2] is None
+
+def test_get_movie_details_batch_empty():
+    assert api_client.get_movie_details_batch([]) == []
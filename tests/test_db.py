@@ -2,51 +2,64 @@ import sqlite3
 import pytest
 import os
 import tempfile # For temporary database file
-import sys
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import shutil
+from datetime import datetime
+import threading
 import db
-from passlib.hash import bcrypt
+import bcrypt
 
 DEFAULT_STATUS = "Want to Watch"
 
+TEST_BCRYPT_ROUNDS = 4 # bcrypt's minimum cost; keeps the hashing in these tests cheap
+
+@pytest.fixture(scope="session")
+def template_db(tmp_path_factory):
+    """
+    Builds the schema and the default user once per session in a template file.
+    Each test gets a copy, so create_database() and the user's bcrypt hash aren't redone per test.
+    """
+    template_path = str(tmp_path_factory.mktemp("db") / "template.db")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(db, 'DATABASE_NAME', template_path)
+        mp.setattr(db, 'BCRYPT_ROUNDS', TEST_BCRYPT_ROUNDS)
+        db.create_database()
+        user_id = db.add_user("testuser", "testpass")
+        if not user_id:
+            pytest.fail("Failed to create default user 'testuser' in the template database.")
+        db.close_connection() # Checkpoints the WAL so the template is a single self-contained file
+    return template_path, user_id
+
 @pytest.fixture(autouse=True)
-def setup_test_db_with_user(monkeypatch):
+def setup_test_db_with_user(monkeypatch, template_db):
     """
-    Creates a temporary database file for each test, initializes the schema,
-    and adds a default user. Cleans up the temp file after the test.
+    Gives each test its own temporary database file, copied from the session template
+    (schema plus the default user). Cleans up the temp file after the test.
     """
     # Create a temporary database file
     temp_db_file = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
     TEST_DB_PATH = temp_db_file.name
     temp_db_file.close() # Close the file handle so sqlite3 can open/manage it
+    template_path, user_id = template_db
+    shutil.copyfile(template_path, TEST_DB_PATH)
 
     # Monkeypatch db.DATABASE_NAME to use this temporary file
     monkeypatch.setattr(db, 'DATABASE_NAME', TEST_DB_PATH)
+    monkeypatch.setattr(db, 'BCRYPT_ROUNDS', TEST_BCRYPT_ROUNDS)
 
-    # Initialize the database schema in the temporary file
+    # The copy already has the current schema, so this only opens the pool and checks user_version
     db.create_database()
 
-    # Add a default user using the db module's function
-    test_username = "testuser"
-    test_password = "testpass"
-    user_id = db.add_user(test_username, test_password)
-    if not user_id:
-        # Fail test explicitly if default user creation fails, as tests depend on it
-        pytest.fail(f"Failed to create default user '{test_username}' in test setup.")
-
-    yield # Test runs here
+    yield user_id # Test runs here
 
     # Teardown: remove the temporary database file
+    db.close_connection() # Also checkpoints and removes the WAL side files
     if os.path.exists(TEST_DB_PATH):
         os.remove(TEST_DB_PATH)
 
-# Helper to get the ID of the default test user, ensuring it exists
-def get_test_user_id():
-    user_id, _ = db.find_user_by_username("testuser")
-    if not user_id:
-        pytest.fail("Default test user 'testuser' not found. Fixture setup might have issues.")
-    return user_id
-
+@pytest.fixture
+def user_id(setup_test_db_with_user):
+    """ID of the default test user, as created in the template database."""
+    return setup_test_db_with_user
 
 def test_create_database_tables_exist():
     # Fixture setup_test_db_with_user ensures db.DATABASE_NAME is set and db.create_database() ran.
@@ -63,6 +76,186 @@ def test_create_database_tables_exist():
     assert movie_table_exists, "Movies table should exist"
     assert user_table_exists, "Users table should exist"
 
+def test_create_database_sets_schema_version():
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    try:
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+    finally:
+        conn.close()
+    assert version == db.SCHEMA_VERSION
+    db.create_database() # Second call is a no-op and must not fail
+
+def test_connection_pragmas():
+    pool = db._get_pool()
+    assert pool.writer.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+    assert pool.writer.execute("PRAGMA foreign_keys;").fetchone()[0] == 1
+    assert pool.writer.execute("PRAGMA busy_timeout;").fetchone()[0] == 5000
+    assert pool.writer.execute("PRAGMA synchronous;").fetchone()[0] == 1 # NORMAL
+    assert pool.writer.execute("PRAGMA query_only;").fetchone()[0] == 0
+    assert pool.writer.execute("PRAGMA wal_autocheckpoint;").fetchone()[0] == db.WAL_AUTOCHECKPOINT_PAGES
+    with db._read_conn() as reader:
+        assert reader.execute("PRAGMA query_only;").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("DELETE FROM movies;")
+    assert db._get_pool() is pool # Reused across calls
+
+def test_checkpoint_db_truncates_wal(user_id):
+    db.add_movie(user_id, {"imdbID": "tt0000001", "Title": "Checkpointed"}, DEFAULT_STATUS)
+    assert os.path.getsize(db.DATABASE_NAME + "-wal") > 0
+    assert db.checkpoint_db() is True
+    assert os.path.getsize(db.DATABASE_NAME + "-wal") == 0
+
+def test_read_pool_is_shared_across_threads():
+    with db._read_conn() as reader:
+        pass
+    seen = []
+    def read_in_thread():
+        with db._read_conn() as conn:
+            seen.append(conn)
+    thread = threading.Thread(target=read_in_thread)
+    thread.start()
+    thread.join()
+    assert seen == [reader] # The idle reader is reused rather than a new connection opened per thread
+
+def test_read_pool_size_is_bounded():
+    pool = db._ConnectionPool(db.DATABASE_NAME, read_pool_size=2, wait_timeout=0.05)
+    try:
+        with pool.reader() as first, pool.reader() as second:
+            assert first is not second
+            with pytest.raises(sqlite3.OperationalError): # No third connection is opened
+                with pool.reader():
+                    pass
+        with pool.reader() as conn:
+            assert conn in (first, second) # A returned reader is reused
+        assert len(pool._readers) == 2
+    finally:
+        pool.close()
+
+def test_read_pool_recovers_from_failed_connect(monkeypatch):
+    pool = db._ConnectionPool(db.DATABASE_NAME, read_pool_size=1, wait_timeout=0.05)
+    real_connect = db._connect
+    def failing_connect(*args, **kwargs):
+        raise sqlite3.OperationalError("unable to open database file")
+    try:
+        monkeypatch.setattr(db, '_connect', failing_connect)
+        with pytest.raises(sqlite3.OperationalError):
+            with pool.reader():
+                pass
+        monkeypatch.setattr(db, '_connect', real_connect)
+        with pool.reader() as conn: # The slot was given back, so this opens a connection instead of waiting
+            assert conn.execute("SELECT 1;").fetchone()[0] == 1
+    finally:
+        pool.close()
+
+def test_pool_close_closes_checked_out_readers():
+    pool = db._ConnectionPool(db.DATABASE_NAME, read_pool_size=2)
+    reader_cm = pool.reader()
+    conn = reader_cm.__enter__()
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError): # Closed even though it was never returned
+        conn.execute("SELECT 1;")
+    reader_cm.__exit__(None, None, None) # Returning it after close is harmless
+
+def test_write_tx_rolls_back_on_error():
+    conn = db._get_pool().writer
+    with pytest.raises(sqlite3.IntegrityError):
+        with db._write_tx() as cursor:
+            cursor.execute("INSERT INTO users (username, hashed_password) VALUES ('txuser', 'x');")
+            cursor.execute("INSERT INTO users (username, hashed_password) VALUES ('txuser', 'x');")
+    assert not conn.in_transaction
+    assert db.find_user_by_username("txuser") == (None, None)
+    # A duplicate username is still reported through the normal return value
+    assert db.add_user("testuser", "whatever") is None
+
+def test_write_tx_rolls_back_when_commit_fails():
+    conn = db._get_pool().writer
+    with pytest.raises(sqlite3.IntegrityError):
+        with db._write_tx() as cursor:
+            cursor.execute("PRAGMA defer_foreign_keys=ON;") # Moves the foreign key check to COMMIT
+            cursor.execute("INSERT INTO movies (user_id, imdb_id) VALUES (9999, 'tt-orphan');")
+    assert not conn.in_transaction
+    assert db.add_user("aftercommitfailure", "pass") is not None # The writer is usable again
+
+def test_movie_list_queries_use_index_order():
+    conn = db._get_pool().writer
+    for query, params in [(db._SQL_GET_ALL_FOR_USER, (1,)), (db._SQL_GET_BY_STATUS, (1, DEFAULT_STATUS, -1, 0))]:
+        plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+        assert "USING INDEX idx_movies_user_" in plan
+        assert "TEMP B-TREE" not in plan # No separate sort step
+
+def _make_pre_v3_db(path):
+    """Writes a database from before schema version 3, which stored date_added as ISO 8601 local-time text."""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, hashed_password TEXT NOT NULL);
+        CREATE TABLE movies (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, imdb_id TEXT NOT NULL,
+            title TEXT, year TEXT, director TEXT, genre TEXT, poster_url TEXT, status TEXT, user_rating INTEGER,
+            date_added TEXT, CONSTRAINT user_movie_unique UNIQUE (user_id, imdb_id));
+        CREATE INDEX idx_movies_user_id ON movies (user_id);
+        INSERT INTO users (username, hashed_password) VALUES ('olduser', 'x');
+        INSERT INTO movies (user_id, imdb_id, title, status, date_added) VALUES (1, 'tt1', 'Old', 'Watched', '2024-01-02T03:04:05.678901');
+    ''')
+    conn.close()
+
+def test_create_database_migrates_text_date_added(tmp_path, monkeypatch):
+    old_db = tmp_path / "old.db"
+    _make_pre_v3_db(old_db)
+    expected_ms = round(datetime.fromisoformat('2024-01-02T03:04:05.678901').timestamp() * 1000)
+
+    db.close_connection()
+    monkeypatch.setattr(db, 'DATABASE_NAME', str(old_db))
+    db.create_database()
+    movie = db.get_all_movies(1)[0]
+    assert movie["title"] == "Old"
+    assert movie["date_added"] == expected_ms
+    assert db.add_movie(1, {'imdbID': 'tt2', 'Title': 'New'}, "Watched") is True
+    assert [m["title"] for m in db.get_all_movies(1)] == ["New", "Old"] # New stamps sort after migrated ones
+    db.close_connection()
+
+def test_create_database_failed_migration_rolls_back(tmp_path, monkeypatch):
+    old_db = tmp_path / "old.db"
+    _make_pre_v3_db(old_db)
+    real_migrate = db._migrate_date_added_to_ms
+    def fail_after_migrating(cursor): # Fails once the table has been rebuilt, e.g. disk full
+        real_migrate(cursor)
+        raise sqlite3.OperationalError("database or disk is full")
+
+    db.close_connection()
+    monkeypatch.setattr(db, 'DATABASE_NAME', str(old_db))
+    monkeypatch.setattr(db, '_migrate_date_added_to_ms', fail_after_migrating)
+    db.create_database() # Logs the error
+    conn = sqlite3.connect(old_db)
+    try:
+        assert conn.execute("PRAGMA user_version;").fetchone()[0] == 0
+        columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(movies);")}
+        assert columns["date_added"] == "TEXT"
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+        assert "movies_migrating" not in tables
+    finally:
+        conn.close()
+    assert not db._get_pool().writer.in_transaction
+
+    # The untouched file migrates cleanly on the next startup
+    monkeypatch.setattr(db, '_migrate_date_added_to_ms', real_migrate)
+    db.create_database()
+    assert db._get_pool().writer.execute("PRAGMA user_version;").fetchone()[0] == db.SCHEMA_VERSION
+    assert db.get_all_movies(1)[0]["title"] == "Old"
+    db.close_connection()
+
+def test_create_database_without_fts5(tmp_path, monkeypatch):
+    def fail_fts(cursor): # A SQLite build without FTS5
+        raise sqlite3.OperationalError("no such module: fts5")
+
+    db.close_connection()
+    monkeypatch.setattr(db, 'DATABASE_NAME', str(tmp_path / "nofts.db"))
+    monkeypatch.setattr(db, '_create_movies_fts', fail_fts)
+    db.create_database()
+    assert db._get_pool().writer.execute("PRAGMA user_version;").fetchone()[0] == db.SCHEMA_VERSION
+    user_id = db.add_user("nofts", "pass")
+    assert db.add_movie(user_id, {'imdbID': 'tt1', 'Title': 'Inception'}, "Watched") is True
+    assert db.search_movies(user_id, "inception") == [] # Search is off; everything else works
+    db.close_connection()
+
 # --- User Tests ---
 def test_add_user():
     user_id = db.add_user("newuser", "newpass")
@@ -70,7 +263,7 @@ def test_add_user():
 
     retrieved_id, hashed_pass = db.find_user_by_username("newuser")
     assert retrieved_id == user_id
-    assert bcrypt.verify("newpass", hashed_pass)
+    assert bcrypt.checkpw(b"newpass", hashed_pass.encode())
 
 def test_add_user_duplicate_username():
     # 'testuser' is added by the fixture. Attempting to add again should fail.
@@ -82,12 +275,79 @@ def test_add_user_duplicate_username():
     user_id_dup = db.add_user("duplicate_me", "pass2")
     assert user_id_dup is None
 
-def test_find_user_by_username_exists():
+def test_add_user_duplicate_skips_hashing(monkeypatch):
+    def fail_hash(password):
+        raise AssertionError("hash_password should not run for a taken username")
+    monkeypatch.setattr(db, 'hash_password', fail_hash)
+    assert db.add_user("testuser", "anotherpass") is None
+
+def test_find_user_by_username_exists(user_id):
     # 'testuser' is added by the setup_test_db_with_user fixture
-    user_id, hashed_pass = db.find_user_by_username("testuser")
-    assert user_id is not None
+    found_id, hashed_pass = db.find_user_by_username("testuser")
+    assert found_id == user_id
     assert hashed_pass is not None
-    assert bcrypt.verify("testpass", hashed_pass)
+    assert bcrypt.checkpw(b"testpass", hashed_pass.encode())
+
+def test_add_user_uses_configured_bcrypt_rounds():
+    _, hashed_pass = db.find_user_by_username("testuser")
+    assert hashed_pass.startswith(f"$2b${db.BCRYPT_ROUNDS:02d}$")
+    assert not db.password_needs_update(hashed_pass)
+
+def test_update_user_password_rehashes_at_configured_cost(user_id):
+    # A hash at another cost is flagged for an upgrade
+    assert db.password_needs_update(bcrypt.hashpw(b"testpass", bcrypt.gensalt(rounds=db.BCRYPT_ROUNDS + 1)).decode())
+
+    _, old_hash = db.find_user_by_username("testuser")
+    assert db.update_user_password(user_id, "testpass") is True
+    _, new_hash = db.find_user_by_username("testuser")
+    assert new_hash != old_hash # Fresh salt
+    assert not db.password_needs_update(new_hash)
+    assert bcrypt.checkpw(b"testpass", new_hash.encode())
+
+def test_verify_password():
+    _, hashed_pass = db.find_user_by_username("testuser")
+    assert db.verify_password("testpass", hashed_pass)
+    assert not db.verify_password("wrongpass", hashed_pass)
+    assert db.dummy_verify() is False
+    with pytest.raises(ValueError):
+        db.verify_password("testpass", "not-a-bcrypt-hash")
+
+def test_verify_user(user_id):
+    assert db.verify_user("testuser", "testpass") == user_id
+    assert db.verify_user("testuser", "wrongpass") is None
+    assert db.verify_user("nosuchuser", "testpass") is None
+
+def test_password_longer_than_72_bytes(monkeypatch):
+    # bcrypt >= 5 raises for passwords over 72 bytes instead of truncating; behave like it whatever is installed
+    real_hashpw, real_checkpw = bcrypt.hashpw, bcrypt.checkpw
+    def strict(func):
+        def wrapper(password, *args):
+            if len(password) > 72:
+                raise ValueError("password cannot be longer than 72 bytes")
+            return func(password, *args)
+        return wrapper
+    monkeypatch.setattr(db._bcrypt, 'hashpw', strict(real_hashpw))
+    monkeypatch.setattr(db._bcrypt, 'checkpw', strict(real_checkpw))
+
+    long_password = "é" * 50 # 100 bytes in UTF-8
+    long_user_id = db.add_user("longpassuser", long_password)
+    assert long_user_id is not None
+    assert db.verify_user("longpassuser", long_password) == long_user_id
+    assert db.verify_user("longpassuser", "é" * 36) == long_user_id # Same first 72 bytes, as bcrypt always used
+    assert db.verify_user("longpassuser", "é" * 35) is None
+
+    # A hash made by passlib, which truncated before hashing, still verifies
+    passlib_style_hash = real_hashpw(long_password.encode()[:72], bcrypt.gensalt(rounds=4)).decode()
+    assert db.verify_password(long_password, passlib_style_hash)
+
+def test_verify_user_upgrades_old_cost_hash(user_id):
+    old_hash = bcrypt.hashpw(b"testpass", bcrypt.gensalt(rounds=db.BCRYPT_ROUNDS + 1)).decode()
+    with db._write_tx() as cursor:
+        cursor.execute("UPDATE users SET hashed_password = ? WHERE id = ?;", (old_hash, user_id))
+    assert db.verify_user("testuser", "testpass") == user_id
+    _, new_hash = db.find_user_by_username("testuser")
+    assert new_hash != old_hash
+    assert not db.password_needs_update(new_hash)
 
 def test_find_user_by_username_not_exists():
     user_id, hashed_pass = db.find_user_by_username("nonexistentuser")
@@ -96,8 +356,7 @@ def test_find_user_by_username_not_exists():
 
 # --- Movie Tests ---
 
-def test_add_movie_for_user():
-    user_id = get_test_user_id()
+def test_add_movie_for_user(user_id):
     movie_data = {
         'imdbID': 'tt0111161', 'Title': 'The Shawshank Redemption', 'Year': '1994',
         'Director': 'Frank Darabont', 'Genre': 'Drama', 'Poster': 'N/A'
@@ -107,13 +366,24 @@ def test_add_movie_for_user():
 
     movies = db.get_all_movies(user_id)
     assert len(movies) == 1
-    # Order of columns in get_all_movies: imdb_id, title, year, director, genre, poster_url, status, date_added
-    assert movies[0][0] == movie_data['imdbID'] # imdb_id
-    assert movies[0][1] == movie_data['Title']  # title
-    assert movies[0][6] == DEFAULT_STATUS     # status
-
-def test_add_movie_duplicate_for_same_user():
-    user_id = get_test_user_id()
+    # Rows are sqlite3.Row objects keyed by db.MOVIE_COLUMNS
+    assert movies[0]["imdb_id"] == movie_data['imdbID']
+    assert movies[0]["title"] == movie_data['Title']
+    assert movies[0]["status"] == DEFAULT_STATUS
+
+def test_add_movies_bulk(user_id):
+    movies = [
+        {'imdbID': 'tt0111161', 'Title': 'The Shawshank Redemption', 'Year': '1994'},
+        {'imdbID': 'tt0068646', 'Title': 'The Godfather', 'Year': '1972'},
+        {'imdbID': 'tt0111161', 'Title': 'The Shawshank Redemption', 'Year': '1994'}, # Duplicate is ignored
+    ]
+    assert db.add_movies_bulk(user_id, movies, DEFAULT_STATUS) == 2
+    assert db.add_movies_bulk(user_id, movies[:1], DEFAULT_STATUS) == 0
+    assert db.add_movies_bulk(user_id, [], DEFAULT_STATUS) == 0
+    assert db.add_movies_bulk(None, movies, DEFAULT_STATUS) == 0
+    assert db.count_movies(user_id, DEFAULT_STATUS) == 2
+
+def test_add_movie_duplicate_for_same_user(user_id):
     movie_data = {'imdbID': 'tt0137523', 'Title': 'Fight Club', 'Year': '1999', 'Director': 'David Fincher', 'Poster': 'N/A', 'Genre': 'Drama'}
 
     success1 = db.add_movie(user_id, movie_data, "Watched")
@@ -124,10 +394,10 @@ def test_add_movie_duplicate_for_same_user():
 
     movies = db.get_all_movies(user_id)
     assert len(movies) == 1 # Still only one entry for this movie for this user
-    assert movies[0][6] == "Watched", "Original status should persist on duplicate attempt"
+    assert movies[0]["status"] == "Watched", "Original status should persist on duplicate attempt"
 
-def test_add_same_movie_for_different_users():
-    user_id1 = get_test_user_id() # "testuser"
+def test_add_same_movie_for_different_users(user_id):
+    user_id1 = user_id # "testuser"
     user_id2 = db.add_user("anotheruser", "anotherpass")
     assert user_id2 is not None, "Failed to create a second user for the test"
 
@@ -140,13 +410,13 @@ def test_add_same_movie_for_different_users():
 
     movies_user1 = db.get_all_movies(user_id1)
     assert len(movies_user1) == 1
-    assert movies_user1[0][1] == movie_data['Title']
-    assert movies_user1[0][6] == "Watched"
+    assert movies_user1[0]["title"] == movie_data['Title']
+    assert movies_user1[0]["status"] == "Watched"
 
     movies_user2 = db.get_all_movies(user_id2)
     assert len(movies_user2) == 1
-    assert movies_user2[0][1] == movie_data['Title']
-    assert movies_user2[0][6] == "Want to Watch"
+    assert movies_user2[0]["title"] == movie_data['Title']
+    assert movies_user2[0]["status"] == "Want to Watch"
 
 def test_get_all_movies_empty_for_new_user():
     new_user_id = db.add_user("emptyuser", "emptypass")
@@ -154,8 +424,7 @@ def test_get_all_movies_empty_for_new_user():
     movies = db.get_all_movies(new_user_id)
     assert len(movies) == 0
 
-def test_get_all_movies_with_data_for_user():
-    user_id = get_test_user_id()
+def test_get_all_movies_with_data_for_user(user_id):
     other_user_id = db.add_user("othermovielistuser", "pass")
     db.add_movie(other_user_id, {'imdbID': 'tt999', 'Title': 'Other User Movie', 'Poster': 'N/A', 'Genre': 'Other', 'Year': '2000', 'Director': 'Dir'}, "Watched")
 
@@ -167,14 +436,115 @@ def test_get_all_movies_with_data_for_user():
     movies = db.get_all_movies(user_id)
     assert len(movies) == 2
     # Movie order is by date_added DESC. For consistent testing, check for presence or sort.
-    titles_in_list = {m[1] for m in movies} # Get a set of titles
+    titles_in_list = {m["title"] for m in movies} # Get a set of titles
     assert movie1_data['Title'] in titles_in_list
     assert movie2_data['Title'] in titles_in_list
     assert "Other User Movie" not in titles_in_list
 
+def test_iter_all_movies_streams_rows(user_id):
+    other_user_id = db.add_user("streamother", "pass")
+    db.add_movie(user_id, {'imdbID': 'tt401', 'Title': 'Mine', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    db.add_movie(other_user_id, {'imdbID': 'tt402', 'Title': 'Theirs', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+
+    rows = db.iter_all_movies(user_id)
+    assert not isinstance(rows, list)
+    assert [m[2] for m in rows] == ['Mine']
+    assert {m[2] for m in db.iter_all_movies()} == {'Mine', 'Theirs'}
+
+def test_get_movies_by_status(user_id):
+    other_user_id = db.add_user("statususer", "pass")
+    db.add_movie(user_id, {'imdbID': 'tt201', 'Title': 'Seen It', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    db.add_movie(user_id, {'imdbID': 'tt202', 'Title': 'Want It', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Want to Watch")
+    db.add_movie(other_user_id, {'imdbID': 'tt203', 'Title': 'Other Seen', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+
+    watched = db.get_movies_by_status(user_id, "Watched")
+    assert [m[2] for m in watched] == ['Seen It']
+    want = db.get_movies_by_status(user_id, "Want to Watch")
+    assert [m[2] for m in want] == ['Want It']
+
+def test_get_movies_by_status_pagination(user_id):
+    for i in range(5):
+        db.add_movie(user_id, {'imdbID': f'tt30{i}', 'Title': f'Paged {i}', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    all_ids = [m[0] for m in db.get_movies_by_status(user_id, "Watched")]
+    assert len(all_ids) == 5
+
+    page1 = db.get_movies_by_status(user_id, "Watched", limit=2)
+    page2 = db.get_movies_by_status(user_id, "Watched", limit=2, offset=2)
+    assert [m[0] for m in page1 + page2] == all_ids[:4]
+
+    # Keyset paging continues after the (date_added, id) of the last row seen
+    last = page1[-1]
+    after_page = db.get_movies_by_status(user_id, "Watched", limit=2, after=(last[9], last[0]))
+    assert [m[0] for m in after_page] == all_ids[2:4]
+
+def test_get_movies_page(user_id):
+    for i in range(5):
+        db.add_movie(user_id, {'imdbID': f'tt70{i}', 'Title': f'Page {i}'}, "Watched" if i % 2 else DEFAULT_STATUS)
+    everything = db.get_all_movies(user_id)
+
+    first = db.get_movies_page(user_id, limit=3)
+    assert len(first) == 3
+    last = first[-1]
+    rest = db.get_movies_page(user_id, limit=3, after=(last["date_added"], last["id"]))
+    assert len(rest) == 2
+    assert {m["id"] for m in first + rest} == {m["id"] for m in everything} # Every movie exactly once
+    assert db.get_movies_page(None) == []
+
+def test_search_movies(user_id):
+    other_user_id = db.add_user("searchother", "pass")
+    db.add_movie(user_id, {'imdbID': 'tt801', 'Title': 'The Dark Knight', 'Director': 'Christopher Nolan', 'Genre': 'Action'}, "Watched")
+    db.add_movie(user_id, {'imdbID': 'tt802', 'Title': 'Inception', 'Director': 'Christopher Nolan', 'Genre': 'Sci-Fi'}, DEFAULT_STATUS)
+    db.add_movie(user_id, {'imdbID': 'tt803', 'Title': 'Amelie', 'Director': 'Jean-Pierre Jeunet', 'Genre': 'Romance'}, DEFAULT_STATUS)
+    db.add_movie(other_user_id, {'imdbID': 'tt804', 'Title': 'Interstellar', 'Director': 'Christopher Nolan'}, "Watched")
+
+    assert {m["title"] for m in db.search_movies(user_id, "nolan")} == {"The Dark Knight", "Inception"}
+    assert [m["title"] for m in db.search_movies(user_id, "christ incep")] == ["Inception"] # Prefix match on every word
+    assert db.search_movies(user_id, 'dark "AND') == [] # FTS syntax is treated as plain text
+    assert db.search_movies(user_id, "   ") == []
+
+    # Deleted movies drop out of the index
+    amelie_id = next(m["id"] for m in db.get_all_movies(user_id) if m["title"] == "Amelie")
+    db.apply_movie_changes(user_id, delete_ids=[amelie_id])
+    assert db.search_movies(user_id, "romance") == []
+
+def test_get_movies_by_status_columnar(user_id):
+    empty = db.get_movies_by_status_columnar(user_id, "Watched")
+    assert list(empty) == list(db.MOVIE_COLUMNS)
+    assert all(values == [] for values in empty.values())
+
+    db.add_movie(user_id, {'imdbID': 'tt501', 'Title': 'Columnar', 'Year': '2001', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    columns = db.get_movies_by_status_columnar(user_id, "Watched")
+    assert columns['title'] == ['Columnar']
+    assert columns['imdb_id'] == ['tt501']
+    assert columns['user_rating'] == [None]
+
+def test_count_movies(user_id):
+    assert db.count_movies(user_id) == 0
+    db.add_movie(user_id, {'imdbID': 'tt204', 'Title': 'Counted', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    assert db.count_movies(user_id) == 1
+    assert db.count_movies(user_id, "Watched") == 1
+    assert db.count_movies(user_id, "Want to Watch") == 0
+
 # --- Delete Tests ---
-def test_delete_all_movies_for_user():
-    user_id = get_test_user_id()
+def test_update_movie_fields(user_id):
+    db.add_movie(user_id, {'imdbID': 'tt601', 'Title': 'Both'}, "Want to Watch")
+    movie_db_id = db.get_all_movies(user_id)[0]["id"]
+
+    assert db.update_movie_fields(movie_db_id, user_rating=4, status="Watched") is True
+    movie = db.get_all_movies(user_id)[0]
+    assert (movie["status"], movie["user_rating"]) == ("Watched", 4)
+
+    assert db.update_movie_rating(movie_db_id, None) is True # None clears the rating, status untouched
+    movie = db.get_all_movies(user_id)[0]
+    assert (movie["status"], movie["user_rating"]) == ("Watched", None)
+
+    assert db.update_movie_status(movie_db_id, "Want to Watch") is True
+    assert db.get_all_movies(user_id)[0]["status"] == "Want to Watch"
+
+    assert db.update_movie_fields(movie_db_id) is False # Nothing to change
+    assert db.update_movie_fields(999999, status="Watched") is False
+
+def test_delete_all_movies_for_user(user_id):
     other_user_id = db.add_user("anotherdeleter", "pass")
 
     db.add_movie(user_id, {'imdbID': 'tt001', 'Title': 'User1 Movie1', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
@@ -190,12 +560,42 @@ def test_delete_all_movies_for_user():
     assert len(db.get_all_movies(user_id)) == 0
     assert len(db.get_all_movies(other_user_id)) == 1
 
-def test_delete_all_movies_for_user_with_no_movies():
-    user_id = get_test_user_id()
+def test_delete_all_movies_for_user_with_no_movies(user_id):
     # Ensure user's list is empty first
     db.delete_all_movies_for_user(user_id)
     assert len(db.get_all_movies(user_id)) == 0
 
     deleted_count = db.delete_all_movies_for_user(user_id)
     assert deleted_count == 0
-    assert len(db.get_all_movies(user_id)) == 0
\ No newline at end of file
+    assert len(db.get_all_movies(user_id)) == 0
+
+# --- Batch Change Tests ---
+def test_apply_movie_changes_in_one_call(user_id):
+    db.add_movie(user_id, {'imdbID': 'tt101', 'Title': 'To Delete', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    db.add_movie(user_id, {'imdbID': 'tt102', 'Title': 'To Move', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    db.add_movie(user_id, {'imdbID': 'tt103', 'Title': 'To Rate', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    # Rows are (id, imdb_id, title, year, director, genre, poster_url, status, user_rating, date_added)
+    ids = {m[2]: m[0] for m in db.get_all_movies(user_id)}
+    db.update_movie_rating(ids['To Move'], 4)
+
+    success = db.apply_movie_changes(
+        user_id,
+        delete_ids=[ids['To Delete']],
+        status_updates=[("Want to Watch", ids['To Move'])],
+        rating_updates=[(5, ids['To Rate'])],
+    )
+    assert success is True
+
+    movies = {m[2]: m for m in db.get_all_movies(user_id)}
+    assert 'To Delete' not in movies
+    assert movies['To Move'][7] == "Want to Watch"
+    assert movies['To Move'][8] is None, "Moving a movie should clear its rating"
+    assert movies['To Rate'][8] == 5
+
+def test_apply_movie_changes_ignores_other_users_movies(user_id):
+    other_user_id = db.add_user("batchother", "pass")
+    db.add_movie(other_user_id, {'imdbID': 'tt104', 'Title': 'Not Mine', 'Year': 'Y', 'Director': 'D', 'Genre': 'G', 'Poster': 'P'}, "Watched")
+    other_movie_id = db.get_all_movies(other_user_id)[0][0]
+
+    assert db.apply_movie_changes(user_id, delete_ids=[other_movie_id]) is True
+    assert len(db.get_all_movies(other_user_id)) == 1
@@ -3,11 +3,9 @@ from unittest.mock import patch, MagicMock
 import sqlite3 # Not strictly needed if only using db.py functions
 import os
 import tempfile # For temporary database file
-import sys
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import db
 import api_client
-from passlib.hash import bcrypt # For setting up test user password
+from diskcache import Cache
 
 DEFAULT_TEST_MOVIE_STATUS = "Want to Watch"
 
@@ -19,13 +17,16 @@ SUCCESS_RESPONSE_JSON = {
 }
 
 @pytest.fixture(autouse=True)
-def setup_test_environment(monkeypatch):
+def setup_test_environment(monkeypatch, tmp_path):
     """
     Sets up a temporary file database, mocks API key, and creates a default user.
     Yields the user_id for use in tests. Cleans up after tests.
     """
     # Mock api_client.OMDB_API_KEY directly
     monkeypatch.setattr(api_client, 'OMDB_API_KEY', 'fake_integration_test_key')
+    # Use an empty OMDb response cache so the mocked API is always hit
+    omdb_cache = Cache(str(tmp_path / "omdb_cache"))
+    monkeypatch.setattr(api_client, '_cache', omdb_cache)
 
     # Setup temporary database file
     temp_db_file = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
@@ -33,6 +34,7 @@ def setup_test_environment(monkeypatch):
     temp_db_file.close()
 
     monkeypatch.setattr(db, 'DATABASE_NAME', TEST_DB_PATH)
+    monkeypatch.setattr(db, 'BCRYPT_ROUNDS', 4) # bcrypt's minimum cost; the user's hash isn't under test
     db.create_database() # Initialize schema in the temp file
 
     # Add a default user for integration tests
@@ -45,11 +47,13 @@ def setup_test_environment(monkeypatch):
     yield user_id # Provide user_id to the test
 
     # Teardown: remove the temporary database file
+    db.close_connection() # Also checkpoints and removes the WAL side files
+    omdb_cache.close()
     if os.path.exists(TEST_DB_PATH):
         os.remove(TEST_DB_PATH)
 
 
-@patch('requests.get') # Mock the external API call
+@patch('api_client._SESSION.get') # Mock the external API call
 def test_fetch_and_save_workflow_for_user(mock_get, setup_test_environment):
     # setup_test_environment fixture provides the test user_id
     test_user_id = setup_test_environment
@@ -70,7 +74,8 @@ def test_fetch_and_save_workflow_for_user(mock_get, setup_test_environment):
     assert fetched_movie_data['imdbID'] == SUCCESS_RESPONSE_JSON['imdbID']
     mock_get.assert_called_once_with(
         'https://www.omdbapi.com/',
-        params={'t': movie_title_to_fetch, 'apikey': 'fake_integration_test_key', 'plot': 'short', 'r': 'json'}
+        params={'t': movie_title_to_fetch, 'apikey': 'fake_integration_test_key', 'plot': 'short', 'r': 'json'},
+        timeout=api_client.OMDB_TIMEOUT
     )
 
     # 2. Save the fetched movie data to the DB for the test user with a status
@@ -82,11 +87,10 @@ def test_fetch_and_save_workflow_for_user(mock_get, setup_test_environment):
     assert len(user_movies) == 1
     
     saved_movie = user_movies[0]
-    # Tuple structure from db.get_all_movies:
-    # (imdb_id, title, year, director, genre, poster_url, status, date_added)
-    assert saved_movie[0] == SUCCESS_RESPONSE_JSON['imdbID']    # imdb_id
-    assert saved_movie[1] == SUCCESS_RESPONSE_JSON['Title']     # title
-    assert saved_movie[6] == DEFAULT_TEST_MOVIE_STATUS        # status
+    # db.get_all_movies returns sqlite3.Row objects keyed by db.MOVIE_COLUMNS
+    assert saved_movie["imdb_id"] == SUCCESS_RESPONSE_JSON['imdbID']
+    assert saved_movie["title"] == SUCCESS_RESPONSE_JSON['Title']
+    assert saved_movie["status"] == DEFAULT_TEST_MOVIE_STATUS
 
     # Try adding the same movie again for the same user - should be ignored
     add_again_success = db.add_movie(test_user_id, fetched_movie_data, "Watched") # different status
@@ -95,4 +99,4 @@ def test_fetch_and_save_workflow_for_user(mock_get, setup_test_environment):
     user_movies_after_reattempt = db.get_all_movies(test_user_id)
     assert len(user_movies_after_reattempt) == 1 # Still only one movie
     # The status should remain as it was when first added, as duplicates are ignored
-    assert user_movies_after_reattempt[0][6] == DEFAULT_TEST_MOVIE_STATUS
\ No newline at end of file
+    assert user_movies_after_reattempt[0]["status"] == DEFAULT_TEST_MOVIE_STATUS
\ No newline at end of file